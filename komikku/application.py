@@ -24,8 +24,8 @@ from gi.repository.GdkPixbuf import Pixbuf
 from komikku.activity_indicator import ActivityIndicator
 from komikku.card import Card
 from komikku.categories_editor import CategoriesEditor
+from komikku.download_manager import DownloadManager
 from komikku.downloader import Downloader
-from komikku.downloader import DownloadManager
 from komikku.explorer import Explorer
 from komikku.library import Library
 from komikku.models import backup_db
@@ -33,6 +33,7 @@ from komikku.models import Settings
 from komikku.preferences import Preferences
 from komikku.reader import Reader
 from komikku.servers import get_allowed_servers_list
+from komikku.servers import get_server_class
 from komikku.updater import Updater
 
 CREDITS = dict(
@@ -111,7 +112,7 @@ class Application(Gtk.Application):
         url = urls[0]
         servers = []
         for data in get_allowed_servers_list(Settings.get_default()):
-            server_class = getattr(data['module'], data['class_name'])
+            server_class = get_server_class(data)
             if not server_class.base_url or not url.startswith(server_class.base_url):
                 continue
 
@@ -506,7 +507,7 @@ class ApplicationWindow(Handy.ApplicationWindow):
                 self.library.show(invalidate_sort=True, invalidate_filter=True)
 
         elif self.page == 'reader':
-            self.reader.remove_pager()
+            self.reader.close()
             self.set_unfullscreen()
 
             # Refresh to update all previously chapters consulted (last page read may have changed)
@@ -2,7 +2,7 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
-from copy import deepcopy
+import datetime
 from gettext import gettext as _
 from gettext import ngettext as n_
 import natsort
@@ -21,13 +21,14 @@ from komikku.models import create_db_connection
 from komikku.models import Category
 from komikku.models import Download
 from komikku.models import Settings
-from komikku.models import update_rows
+from komikku.models import update_chapters_read_status
 from komikku.servers import get_file_mime_type
 from komikku.utils import create_cairo_surface_from_pixbuf
-from komikku.utils import folder_size
 from komikku.utils import html_escape
 from komikku.utils import scale_pixbuf_animation
 
+CHAPTERS_LIST_PAGE_SIZE = 50  # Number of chapters rows added at once (at populate and when scrolling reaches end of list)
+
 
 class Card:
     manga = None
@@ -168,7 +169,7 @@ class Card:
         self.info.on_resize()
 
     def on_resume_read_button_clicked(self, widget):
-        chapters = [child.chapter for child in self.chapters_list.listbox.get_children()]
+        chapters = self.chapters_list.chapters[:]
         if self.chapters_list.sort_order.endswith('desc'):
             chapters.reverse()
 
@@ -276,7 +277,20 @@ class CategoriesList:
 
 
 class ChaptersList:
+    """Chapters list of card
+
+    Rows are not created for all chapters at once (series can have thousands of chapters): list is backed by a model
+    (chapters sorted according to sort order) and rows are added by pages when scrolling reaches the end of list.
+    All rows are only created when needed (search, select all).
+    """
+
     action_row = None
+    add_rows_idle_id = None
+    adding_all_rows = False
+    chapters = []  # Model: chapters sorted according to sort order
+    chapters_index = {}  # Chapter id => index in model
+    nb_rows = 0  # Number of chapters of model for which a row has been added
+    rows_index = {}  # Chapter id => row, allows O(1) row updates (download progress)
     selection_mode_range = False
     selection_mode_last_row_index = None
     selection_mode_last_walk_direction = None
@@ -293,6 +307,10 @@ class ChaptersList:
         self.listbox.connect('selected-rows-changed', self.on_selection_changed)
         self.listbox.connect('unselect-all', self.card.leave_selection_mode)
 
+        self.vadj = self.listbox.get_ancestor(Gtk.ScrolledWindow).get_vadjustment()
+        self.vadj.connect('changed', self.on_scroll_changed)
+        self.vadj.connect('value-changed', self.on_scroll_changed)
+
         self.gesture = Gtk.GestureLongPress.new(self.listbox)
         self.gesture.set_touch_only(False)
         self.gesture.connect('pressed', self.on_gesture_long_press_activated)
@@ -392,10 +410,67 @@ class ChaptersList:
         reset_chapter_action.connect('activate', self.reset_chapter)
         self.window.application.add_action(reset_chapter_action)
 
+    def add_all_rows(self, callback=None):
+        """Adds rows of all remaining chapters of model, by chunks in idle time"""
+
+        def add_rows_by_chunks():
+            while self.nb_rows < len(self.chapters):
+                if self.populate_generator_stop_flag:
+                    break
+
+                self.add_rows()
+                yield True
+
+            self.adding_all_rows = False
+            self.window.activity_indicator.stop()
+
+            if callback and not self.populate_generator_stop_flag:
+                callback()
+
+        if self.nb_rows == len(self.chapters):
+            if callback:
+                callback()
+            return
+
+        if self.adding_all_rows:
+            return
+
+        self.adding_all_rows = True
+        self.window.activity_indicator.start()
+
+        gen = add_rows_by_chunks()
+        GLib.idle_add(lambda: next(gen, False), priority=GLib.PRIORITY_DEFAULT_IDLE)
+
+    def add_rows(self):
+        """Adds rows of the next page of chapters of model"""
+        self.add_rows_idle_id = None
+
+        end = min(self.nb_rows + CHAPTERS_LIST_PAGE_SIZE, len(self.chapters))
+        for chapter in self.chapters[self.nb_rows:end]:
+            row = Gtk.ListBoxRow()
+            row.get_style_context().add_class('card-chapter-listboxrow')
+            row.chapter = chapter
+            row.download = None
+            row._selected = False
+            self.populate_chapter_row(row)
+            self.listbox.add(row)
+            self.rows_index[chapter.id] = row
+
+        self.nb_rows = end
+
+        return False
+
     def clear(self):
+        if self.add_rows_idle_id is not None:
+            GLib.source_remove(self.add_rows_idle_id)
+            self.add_rows_idle_id = None
+
         for row in self.listbox.get_children():
             row.destroy()
 
+        self.nb_rows = 0
+        self.rows_index = {}
+
     def download_chapter(self, action, param):
         # Add chapter in download queue
         self.window.downloader.add([self.action_row.chapter, ], emit_signal=True)
@@ -527,6 +602,14 @@ class ChaptersList:
 
         return Gdk.EVENT_STOP
 
+    def on_scroll_changed(self, vadj):
+        if self.nb_rows == len(self.chapters) or self.add_rows_idle_id is not None:
+            return
+
+        if vadj.get_value() + 2 * vadj.get_page_size() >= vadj.get_upper():
+            # Less than one page before end of list: add next rows
+            self.add_rows_idle_id = GLib.idle_add(self.add_rows)
+
     def on_search_activate(self, _entry):
         row = self.listbox.get_row_at_y(0)
         if row:
@@ -568,41 +651,22 @@ class ChaptersList:
 
         self.card.resume_read_button.set_sensitive(False)
 
-        if not self.card.manga.chapters:
+        self.chapters = self.sort(self.card.manga.chapters)
+        self.chapters_index = {chapter.id: index for index, chapter in enumerate(self.chapters)}
+        if not self.chapters:
             return
 
-        def add_chapters_rows():
-            for chapter in self.card.manga.chapters:
-                if self.populate_generator_stop_flag:
-                    self.window.activity_indicator.stop()
-                    return
-
-                row = Gtk.ListBoxRow()
-                row.get_style_context().add_class('card-chapter-listboxrow')
-                row.chapter = chapter
-                row.download = None
-                row._selected = False
-                self.populate_chapter_row(row)
-                self.listbox.add(row)
-                yield True
-
-            self.listbox.set_sort_func(self.sort_func)
-            self.listbox.invalidate_sort()
-            self.card.set_actions_enabled(True)
-            self.card.resume_read_button.set_sensitive(True)
-            self.window.activity_indicator.stop()
+        self.populate_generator_stop_flag = False
+        self.adding_all_rows = False
 
-        def run_generator(func):
-            self.window.activity_indicator.start()
-            self.card.set_actions_enabled(False)
+        # Only the first rows are created, next ones are added on scroll
+        self.add_rows()
 
-            gen = func()
-            GLib.idle_add(lambda: next(gen, False), priority=GLib.PRIORITY_DEFAULT_IDLE)
+        self.card.set_actions_enabled(True)
+        self.card.resume_read_button.set_sensitive(True)
 
-        self.populate_generator_stop_flag = False
-        self.listbox.set_sort_func(None)
-
-        run_generator(add_chapters_rows)
+        if self.search_entry.get_text():
+            self.add_all_rows()
 
     def populate_chapter_row(self, row):
         for child in row.get_children():
@@ -749,6 +813,9 @@ class ChaptersList:
         self.card.leave_selection_mode()
 
     def search(self, _entry):
+        # Search applies on all chapters
+        self.add_all_rows()
+
         self.listbox.invalidate_filter()
 
     @property
@@ -767,6 +834,9 @@ class ChaptersList:
             self.card.enter_selection_mode()
 
         def select_chapters_rows():
+            if not self.card.selection_mode:
+                return
+
             self.listbox.emit('select-all')
 
             for row in self.listbox.get_selected_rows():
@@ -787,12 +857,13 @@ class ChaptersList:
             gen = func()
             GLib.idle_add(lambda: next(gen, False), priority=GLib.PRIORITY_DEFAULT_IDLE)
 
-        run_generator(select_chapters_rows)
+        # All chapters must have a row to be selected
+        self.add_all_rows(lambda: run_generator(select_chapters_rows))
 
     def set_sort_order(self, invalidate=True):
         self.card.sort_order_action.set_state(GLib.Variant('s', self.sort_order))
         if invalidate:
-            self.listbox.invalidate_sort()
+            self.populate()
 
     def show_chapter_menu(self, button, row):
         chapter = row.chapter
@@ -815,35 +886,23 @@ class ChaptersList:
         popover.bind_model(menu, None)
         popover.popup()
 
-    def sort_func(self, child1, child2):
-        """
-        This function gets two children and has to return:
-        - a negative integer if the firstone should come before the second one
-        - zero if they are equal
-        - a positive integer if the second one should come before the firstone
+    def sort(self, chapters):
+        """Returns chapters sorted according to sort order
+
+        Chapters come sorted by rank from DB (sorting them again by rank is linear),
+        other sort orders use a sort key (no comparison callbacks).
         """
         if self.sort_order in ('asc', 'desc'):
-            if child1.chapter.rank > child2.chapter.rank:
-                return -1 if self.sort_order == 'desc' else 1
-
-            if child1.chapter.rank < child2.chapter.rank:
-                return 1 if self.sort_order == 'desc' else -1
-
-        elif self.sort_order in ('date-asc', 'date-desc') and child1.chapter.date and child2.chapter.date:
-            if child1.chapter.date > child2.chapter.date and child1.chapter.id > child2.chapter.id:
-                return -1 if self.sort_order == 'date-desc' else 1
-
-            if child1.chapter.date < child2.chapter.date and child1.chapter.id < child2.chapter.id:
-                return 1 if self.sort_order == 'date-desc' else -1
-
+            chapters = sorted(chapters, key=lambda chapter: chapter.rank)
+        elif self.sort_order in ('date-asc', 'date-desc'):
+            chapters = sorted(chapters, key=lambda chapter: (chapter.date or datetime.date.min, chapter.id))
         elif self.sort_order in ('natural-asc', 'natural-desc'):
-            lst = natsort.natsorted([child1.chapter.title, child2.chapter.title], alg=natsort.ns.INT | natsort.ns.IC)
-            if lst[0] == child1.chapter.title:
-                return 1 if self.sort_order == 'natural-desc' else -1
+            chapters = natsort.natsorted(chapters, key=lambda chapter: chapter.title, alg=natsort.ns.INT | natsort.ns.IC)
 
-            return -1 if self.sort_order == 'natural-desc' else 1
+        if self.sort_order.endswith('desc'):
+            chapters.reverse()
 
-        return 0
+        return chapters
 
     def toggle_selected_chapters_read_status(self, action, param, read):
         chapters_ids = []
@@ -855,38 +914,22 @@ class ChaptersList:
         for row in self.listbox.get_selected_rows():
             chapter = row.chapter
 
-            if chapter.pages:
-                pages = deepcopy(chapter.pages)
-                for page in pages:
-                    page['read'] = read
-            else:
-                pages = None
-
             chapters_ids.append(chapter.id)
             chapters_data.append(dict(
                 last_page_read_index=None,
-                pages=pages,
                 read=read,
                 recent=False,
             ))
 
-        db_conn = create_db_connection()
-
-        with db_conn:
-            res = update_rows(db_conn, 'chapters', chapters_ids, chapters_data)
-
-        db_conn.close()
+        res = update_chapters_read_status(chapters_ids, chapters_data, read)
 
         if res:
             # Then, if DB update succeeded, update chapters rows
             def update_chapters_rows():
-                for row in self.listbox.get_selected_rows():
+                for row, chapter_data in zip(self.listbox.get_selected_rows(), chapters_data):
                     chapter = row.chapter
 
-                    if chapter.pages:
-                        for chapter_page in chapter.pages:
-                            chapter_page['read'] = read
-
+                    chapter.pages = chapter_data['pages']
                     chapter.last_page_read_index = None
                     chapter.read = read
                     chapter.recent = False
@@ -909,18 +952,16 @@ class ChaptersList:
     def toggle_chapter_read_status(self, action, param, read):
         chapter = self.action_row.chapter
 
-        if chapter.pages:
-            for chapter_page in chapter.pages:
-                chapter_page['read'] = read
-
         data = dict(
             last_page_read_index=None,
-            pages=chapter.pages,
             read=read,
             recent=False,
         )
 
-        if chapter.update(data):
+        if update_chapters_read_status([chapter.id], [data], read):
+            for key in data:
+                setattr(chapter, key, data[key])
+
             self.populate_chapter_row(self.action_row)
 
     def update_chapter_row(self, downloader=None, download=None, chapter=None):
@@ -935,12 +976,16 @@ class ChaptersList:
         if self.window.page not in ('card', 'reader') or self.card.manga.id != chapter.manga_id:
             return
 
-        for row in self.listbox.get_children():
-            if row.chapter.id == chapter.id:
-                row.chapter = chapter
-                row.download = download
-                self.populate_chapter_row(row)
-                break
+        index = self.chapters_index.get(chapter.id)
+        if index is not None:
+            # Update model, chapter row may not have been added yet
+            self.chapters[index] = chapter
+
+        row = self.rows_index.get(chapter.id)
+        if row is not None:
+            row.chapter = chapter
+            row.download = download
+            self.populate_chapter_row(row)
 
 
 class Info:
@@ -1021,4 +1066,5 @@ class Info:
         self.set_disk_usage()
 
     def set_disk_usage(self):
-        self.size_on_disk_value_label.set_text(folder_size(self.card.manga.path) or '-')
+        disk_usage = self.card.manga.disk_usage
+        self.size_on_disk_value_label.set_text(GLib.format_size(disk_usage) if disk_usage else '-')
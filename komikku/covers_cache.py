@@ -0,0 +1,180 @@
+# Copyright (C) 2019-2021 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import hashlib
+import logging
+import math
+import os
+
+from gi.repository import GLib
+from gi.repository.GdkPixbuf import InterpType
+from gi.repository.GdkPixbuf import Pixbuf
+from gi.repository.GdkPixbuf import PixbufAnimation
+
+from komikku.utils import create_cairo_surface_from_pixbuf
+from komikku.utils import get_cache_dir
+
+COVERS_CACHE_MEMORY_SIZE = 64 * 1024 * 1024  # in bytes
+# Thumbnails widths are rounded up to a multiple of this step (in device pixels) and downscaled when drawn:
+# resizing window doesn't create new thumbnails for each pixel of width
+COVERS_CACHE_SIZE_STEP = 32
+COVERS_CACHE_WORKERS = 2
+MISSING_COVER_RESOURCE_PATH = '/info/febvre/Komikku/images/missing_file.png'
+
+logger = logging.getLogger('komikku')
+
+
+class CoversCache:
+    """Cache of covers thumbnails used by Library
+
+    Thumbnails are scaled by a pool of workers to the size (in device pixels) at which they are drawn, quantized
+    (see COVERS_CACHE_SIZE_STEP). They are stored on disk (keyed by cover path, cover mtime and size, only one size
+    is kept per cover) and kept in memory as cairo surfaces, in a memory-budgeted LRU cache.
+    Draws only have to paint cached surfaces.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.latest = {}  # Key of the last thumbnail added for each cover, drawn (scaled) while a new size is prepared
+        self.used = 0
+        self.pending = {}
+        self.workers = ThreadPoolExecutor(max_workers=COVERS_CACHE_WORKERS, thread_name_prefix='komikku-covers')
+
+    @property
+    def dir(self):
+        path = os.path.join(get_cache_dir(), 'covers')
+        if not os.path.exists(path):
+            os.makedirs(path, exist_ok=True)
+
+        return path
+
+    def _add(self, key, surface):
+        nbytes = surface.get_stride() * surface.get_height()
+
+        if key in self.entries:
+            self.used -= self.entries.pop(key)[1]
+
+        self.entries[key] = (surface, nbytes)
+        self.latest[key[0]] = key
+        self.used += nbytes
+
+        while self.used > COVERS_CACHE_MEMORY_SIZE and len(self.entries) > 1:
+            _key, (_surface, nbytes) = self.entries.popitem(last=False)
+            self.used -= nbytes
+
+    def clear(self):
+        self.entries.clear()
+        self.latest.clear()
+        self.used = 0
+
+    def get(self, path, width, height, hidpi_scale, callback):
+        """Returns a cover thumbnail surface, its size can differ from requested size: it must be scaled when drawn
+
+        If thumbnail of requested size is not cached, it's requested to a worker and `callback` is called (in main thread)
+        once it's ready. In the meantime, the last thumbnail of another size is returned if any, None otherwise.
+        Must be called from main thread.
+        """
+        device_width = max(int(width * hidpi_scale), 1)
+        device_height = max(int(height * hidpi_scale), 1)
+        bucket_width = math.ceil(device_width / COVERS_CACHE_SIZE_STEP) * COVERS_CACHE_SIZE_STEP
+        key = (path, bucket_width, round(device_height * bucket_width / device_width))
+
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+
+        fallback_key = self.latest.get(path)
+        fallback = self.entries[fallback_key][0] if fallback_key in self.entries else None
+
+        if key in self.pending:
+            self.pending[key].append(callback)
+            return fallback
+
+        self.pending[key] = [callback]
+
+        def run():
+            try:
+                pixbuf = self.get_thumbnail_pixbuf(*key)
+                surface = create_cairo_surface_from_pixbuf(pixbuf, hidpi_scale)
+            except Exception as e:
+                logger.info(f'Failed to create cover thumbnail of {path}: {e}')
+                surface = None
+
+            GLib.idle_add(complete, surface)
+
+        def complete(surface):
+            callbacks = self.pending.pop(key, [])
+            if surface is not None:
+                self._add(key, surface)
+
+                for cb in callbacks:
+                    cb()
+
+            return False
+
+        self.workers.submit(run)
+
+        return fallback
+
+    def get_thumbnail_pixbuf(self, path, width, height):
+        """Returns the cover thumbnail pixbuf scaled to width x height (runs in a worker thread)"""
+        if path is None:
+            return Pixbuf.new_from_resource_at_scale(MISSING_COVER_RESOURCE_PATH, width, height, False)
+
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return Pixbuf.new_from_resource_at_scale(MISSING_COVER_RESOURCE_PATH, width, height, False)
+
+        prefix = hashlib.sha1(path.encode()).hexdigest()
+        thumbnail_path = os.path.join(self.dir, f'{prefix}-{mtime}-{width}x{height}.jpg')
+
+        if os.path.exists(thumbnail_path):
+            try:
+                return Pixbuf.new_from_file(thumbnail_path)
+            except GLib.GError:
+                pass
+
+        try:
+            format, _width, _height = Pixbuf.get_file_info(path)
+            if format is not None and 'image/gif' in format.get_mime_types():
+                # First frame of animated GIF
+                pixbuf = PixbufAnimation.new_from_file(path).get_static_image().scale_simple(width, height, InterpType.BILINEAR)
+            else:
+                pixbuf = Pixbuf.new_from_file_at_scale(path, width, height, False)
+        except Exception:
+            # Invalid image, corrupted image, unsupported image format,...
+            return Pixbuf.new_from_resource_at_scale(MISSING_COVER_RESOURCE_PATH, width, height, False)
+
+        # Remove thumbnails of previous versions of cover and of other sizes
+        for stale_path in glob.glob(os.path.join(self.dir, f'{prefix}-*.jpg')):
+            if stale_path != thumbnail_path:
+                try:
+                    os.unlink(stale_path)
+                except OSError:
+                    pass
+
+        try:
+            if pixbuf.get_has_alpha():
+                # JPEG doesn't support alpha channel
+                opaque_pixbuf = pixbuf.composite_color_simple(width, height, InterpType.NEAREST, 255, 1, 0xffffff, 0xffffff)
+                opaque_pixbuf.savev(thumbnail_path, 'jpeg', ['quality'], ['90'])
+            else:
+                pixbuf.savev(thumbnail_path, 'jpeg', ['quality'], ['90'])
+        except GLib.GError as e:
+            logger.info(f'Failed to save cover thumbnail of {path}: {e}')
+
+        return pixbuf
+
+    def invalidate(self, path):
+        """Removes in memory thumbnails of a cover (on disk ones are invalidated by cover mtime)"""
+        for key in [key for key in self.entries if key[0] == path]:
+            self.used -= self.entries.pop(key)[1]
+        self.latest.pop(path, None)
+
+
+covers_cache = CoversCache()
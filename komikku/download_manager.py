@@ -0,0 +1,378 @@
+# Copyright (C) 2019-2021 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+from gettext import gettext as _
+from gettext import ngettext as n_
+
+from gi.repository import Gdk
+from gi.repository import Gio
+from gi.repository import GLib
+from gi.repository import Gtk
+
+from komikku.models import create_db_connection
+from komikku.models import Download
+from komikku.utils import if_network_available
+
+
+@Gtk.Template.from_resource('/info/febvre/Komikku/ui/download_manager.ui')
+class DownloadManager(Gtk.ScrolledWindow):
+    __gtype_name__ = 'DownloadManager'
+    __gsignals_handlers_ids__ = None
+
+    selection_mode = False
+    selection_mode_count = 0
+    selection_mode_range = False
+    selection_mode_last_row_index = None
+
+    rows_index = {}  # Chapter id => row, allows O(1) row updates (download progress)
+
+    stack = Gtk.Template.Child('stack')
+    listbox = Gtk.Template.Child('listbox')
+
+    def __init__(self, window):
+        Gtk.ScrolledWindow.__init__(self)
+
+        self.window = window
+        self.downloader = self.window.downloader
+
+        self.builder = window.builder
+        self.builder.add_from_resource('/info/febvre/Komikku/ui/menu/download_manager.xml')
+        self.builder.add_from_resource('/info/febvre/Komikku/ui/menu/download_manager_selection_mode.xml')
+
+        self.subtitle_label = self.window.download_manager_subtitle_label
+        self.start_stop_button = self.window.download_manager_start_stop_button
+
+        self.connect('key-press-event', self.on_key_press_event)
+        self.start_stop_button.connect('clicked', self.on_start_stop_button_clicked)
+        self.listbox.connect('button-press-event', self.on_button_pressed)
+        self.listbox.connect('row-activated', self.on_download_row_clicked)
+        self.listbox.connect('selected-rows-changed', self.on_selection_changed)
+
+        # Gesture for multi-selection mode
+        self.gesture = Gtk.GestureLongPress.new(self.listbox)
+        self.gesture.set_touch_only(False)
+        self.gesture.connect('pressed', self.on_gesture_long_press_activated)
+
+        self.__gsignals_handlers_ids__ = [
+            self.downloader.connect('download-changed', self.update_row),
+            self.downloader.connect('ended', self.update_headerbar),
+            self.downloader.connect('started', self.update_headerbar),
+        ]
+
+        self.window.stack.add_named(self, 'download_manager')
+
+    @property
+    def rows(self):
+        return self.listbox.get_children()
+
+    def add_actions(self):
+        # Delete All action
+        delete_all_action = Gio.SimpleAction.new('download-manager.delete-all', None)
+        delete_all_action.connect('activate', self.on_menu_delete_all_clicked)
+        self.window.application.add_action(delete_all_action)
+
+        # Delete Selected action
+        delete_selected_action = Gio.SimpleAction.new('download-manager.delete-selected', None)
+        delete_selected_action.connect('activate', self.on_menu_delete_selected_clicked)
+        self.window.application.add_action(delete_selected_action)
+
+    def enter_selection_mode(self):
+        self.selection_mode = True
+        self.selection_mode_count = 0
+
+        self.listbox.set_selection_mode(Gtk.SelectionMode.MULTIPLE)
+
+        self.window.headerbar.get_style_context().add_class('selection-mode')
+        self.window.menu_button.set_menu_model(self.builder.get_object('menu-download-manager-selection-mode'))
+
+    def leave_selection_mode(self):
+        self.selection_mode = False
+
+        self.listbox.set_selection_mode(Gtk.SelectionMode.NONE)
+        for row in self.rows:
+            row._selected = False
+
+        self.window.headerbar.get_style_context().remove_class('selection-mode')
+        self.window.menu_button.set_menu_model(self.builder.get_object('menu-download-manager'))
+
+    def on_button_pressed(self, _widget, event):
+        row = self.listbox.get_row_at_y(event.y)
+        if not self.selection_mode and event.type == Gdk.EventType.BUTTON_PRESS and event.button == 3 and row is not None:
+            self.enter_selection_mode()
+            self.on_download_row_clicked(None, row)
+            return Gdk.EVENT_STOP
+
+        return Gdk.EVENT_PROPAGATE
+
+    def on_download_row_clicked(self, _listbox, row):
+        _ret, state = Gtk.get_current_event_state()
+        modifiers = Gtk.accelerator_get_default_mod_mask()
+
+        # Enter selection mode if <Control>+Click or <Shift>+Click is done
+        if state & modifiers in (Gdk.ModifierType.CONTROL_MASK, Gdk.ModifierType.SHIFT_MASK) and not self.selection_mode:
+            self.enter_selection_mode()
+
+        if not self.selection_mode:
+            return
+
+        if state & modifiers == Gdk.ModifierType.SHIFT_MASK:
+            # Enter range selection mode if <Shift>+Click is done
+            self.selection_mode_range = True
+
+        if self.selection_mode_range and self.selection_mode_last_row_index is not None:
+            # Range selection mode: select all rows between last selected row and clicked row
+            walk_index = self.selection_mode_last_row_index
+            last_index = row.get_index()
+
+            while walk_index != last_index:
+                walk_row = self.listbox.get_row_at_index(walk_index)
+                if walk_row and not walk_row._selected:
+                    self.selection_mode_count += 1
+                    self.listbox.select_row(walk_row)
+                    walk_row._selected = True
+
+                if walk_index < last_index:
+                    walk_index += 1
+                else:
+                    walk_index -= 1
+
+        self.selection_mode_range = False
+
+        if row._selected:
+            self.selection_mode_count -= 1
+            self.listbox.unselect_row(row)
+            self.selection_mode_last_row_index = None
+            row._selected = False
+        else:
+            self.selection_mode_count += 1
+            self.listbox.select_row(row)
+            self.selection_mode_last_row_index = row.get_index()
+            row._selected = True
+
+        if self.selection_mode_count == 0:
+            self.leave_selection_mode()
+
+    def on_gesture_long_press_activated(self, _gesture, _x, _y):
+        if self.selection_mode:
+            # Enter in 'Range' selection mode
+            # Long press on a download row then long press on another to select everything in between
+            self.selection_mode_range = True
+        else:
+            self.enter_selection_mode()
+
+    def on_key_press_event(self, _widget, event):
+        modifiers = event.get_state() & Gtk.accelerator_get_default_mod_mask()
+
+        # <Control>+Key
+        if modifiers == Gdk.ModifierType.CONTROL_MASK:
+            # <Control>+A (select all)
+            if event.keyval in (Gdk.KEY_a, Gdk.KEY_A):
+                self.select_all()
+                return Gdk.EVENT_STOP
+
+        return Gdk.EVENT_PROPAGATE
+
+    def on_menu_delete_all_clicked(self, _action, _param):
+        chapters = []
+        for row in self.rows:
+            chapters.append(row.download.chapter)
+            row.destroy()
+        self.rows_index = {}
+
+        self.downloader.remove(chapters)
+
+        self.leave_selection_mode()
+        self.update_headerbar()
+        GLib.idle_add(self.stack.set_visible_child_name, 'empty')
+
+    def on_menu_delete_selected_clicked(self, _action, _param):
+        chapters = []
+        for row in self.rows:
+            if row._selected:
+                chapters.append(row.download.chapter)
+                self.rows_index.pop(row.download.chapter_id, None)
+                row.destroy()
+
+        self.downloader.remove(chapters)
+
+        self.leave_selection_mode()
+        self.update_headerbar()
+        if not self.rows_index:
+            GLib.idle_add(self.stack.set_visible_child_name, 'empty')
+
+    def on_selection_changed(self, _flowbox):
+        number = len(self.listbox.get_selected_rows())
+        if number:
+            self.subtitle_label.set_label(n_('{0} selected', '{0} selected', number).format(number))
+            self.subtitle_label.show()
+        else:
+            self.subtitle_label.hide()
+
+    @if_network_available
+    def on_start_stop_button_clicked(self, _button):
+        self.start_stop_button.set_sensitive(False)
+
+        if self.downloader.running:
+            self.downloader.stop(save_state=True)
+        else:
+            self.downloader.start()
+
+    def populate(self):
+        for row in self.rows:
+            row.destroy()
+        self.rows_index = {}
+
+        db_conn = create_db_connection()
+        records = db_conn.execute('SELECT * FROM downloads ORDER BY date ASC').fetchall()
+        db_conn.close()
+
+        if records:
+            for record in records:
+                download = Download.get(record['id'])
+
+                row = DownloadRow(download)
+                self.listbox.add(row)
+                self.rows_index[download.chapter_id] = row
+
+            self.listbox.show_all()
+            self.stack.set_visible_child_name('list')
+        else:
+            self.stack.set_visible_child_name('empty')
+
+    def select_all(self):
+        if not self.selection_mode:
+            self.enter_selection_mode()
+
+        self.selection_mode_count = len(self.listbox.get_children())
+
+        for row in self.listbox.get_children():
+            if row._selected:
+                continue
+            self.listbox.select_row(row)
+            row._selected = True
+
+    def show(self, transition=True):
+        self.populate()
+
+        self.window.left_button_image.set_from_icon_name('go-previous-symbolic', Gtk.IconSize.BUTTON)
+        self.window.library_flap_reveal_button.hide()
+
+        self.window.right_button_stack.set_visible_child_name('download_manager')
+
+        self.window.menu_button.set_menu_model(self.builder.get_object('menu-download-manager'))
+        self.window.menu_button_image.set_from_icon_name('view-more-symbolic', Gtk.IconSize.BUTTON)
+
+        self.window.show_page('download_manager', transition=transition)
+
+        self.update_headerbar()
+
+    def update_headerbar(self, *args):
+        if self.window.page != 'download_manager':
+            return
+
+        if self.rows:
+            self.window.right_button_stack.show()
+            if self.downloader.running:
+                self.start_stop_button.get_children()[0].set_from_icon_name('media-playback-stop-symbolic', Gtk.IconSize.BUTTON)
+            else:
+                self.start_stop_button.get_children()[0].set_from_icon_name('media-playback-start-symbolic', Gtk.IconSize.BUTTON)
+
+            self.start_stop_button.set_sensitive(True)
+            self.start_stop_button.show()
+            self.window.menu_button.show()
+        else:
+            self.window.right_button_stack.hide()
+            self.window.menu_button.hide()
+
+    def update_row(self, _downloader, download, chapter):
+        chapter_id = chapter.id if chapter is not None else download.chapter_id
+
+        row = self.rows_index.get(chapter_id)
+        if row is not None:
+            row.download = download
+            if row.download:
+                row.update()
+            else:
+                del self.rows_index[chapter_id]
+                row.destroy()
+
+        if not self.rows_index:
+            self.stack.set_visible_child_name('empty')
+
+
+class DownloadRow(Gtk.ListBoxRow):
+    _selected = False
+
+    def __init__(self, download):
+        Gtk.ListBoxRow.__init__(self)
+
+        self.get_style_context().add_class('download-manager-download-listboxrow')
+
+        self.download = download
+
+        if self.download.percent:
+            nb_pages = len(download.chapter.pages)
+            counter = int((nb_pages / 100) * self.download.percent)
+            fraction = self.download.percent / 100
+        else:
+            counter = None
+            fraction = None
+
+        vbox = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=6)
+
+        hbox = Gtk.Box(orientation=Gtk.Orientation.HORIZONTAL, spacing=6)
+        # Manga
+        label = Gtk.Label(xalign=0)
+        label.get_style_context().add_class('download-manager-download-label')
+        label.set_valign(Gtk.Align.CENTER)
+        label.set_line_wrap(True)
+        label.set_text(download.chapter.manga.name)
+        hbox.pack_start(label, True, True, 0)
+
+        # Progress label
+        self.progress_label = Gtk.Label(xalign=0)
+        self.progress_label.get_style_context().add_class('download-manager-download-sublabel')
+        self.progress_label.set_valign(Gtk.Align.CENTER)
+        self.progress_label.set_line_wrap(True)
+        text = _(Download.STATUSES[self.download.status]).upper() if self.download.status == 'error' else ''
+        if counter:
+            text = f'{text} {counter}/{nb_pages}'
+        if text:
+            self.progress_label.set_text(text)
+        hbox.pack_start(self.progress_label, False, False, 0)
+
+        vbox.pack_start(hbox, True, True, 0)
+
+        # Chapter
+        label = Gtk.Label(xalign=0)
+        label.get_style_context().add_class('download-manager-download-sublabel')
+        label.set_valign(Gtk.Align.CENTER)
+        label.set_line_wrap(True)
+        label.set_text(download.chapter.title)
+        vbox.pack_start(label, True, True, 0)
+
+        # Progress bar
+        self.progressbar = Gtk.ProgressBar()
+        self.progressbar.set_show_text(False)
+        if fraction:
+            self.progressbar.set_fraction(fraction)
+        vbox.pack_start(self.progressbar, True, True, 0)
+
+        self.add(vbox)
+
+    def update(self):
+        """
+        Updates chapter download progress
+        """
+        if not self.download.chapter.pages:
+            return
+
+        nb_pages = len(self.download.chapter.pages)
+        counter = int((nb_pages / 100) * self.download.percent)
+        fraction = self.download.percent / 100
+
+        self.progressbar.set_fraction(fraction)
+        text = _(Download.STATUSES[self.download.status]).upper() if self.download.status == 'error' else ''
+        text = f'{text} {counter}/{nb_pages}'
+        self.progress_label.set_text(text)
@@ -20,12 +20,18 @@ from komikku.models import Manga
 from komikku.models import Settings
 from komikku.servers import get_allowed_servers_list
 from komikku.servers import get_buffer_mime_type
+from komikku.servers import get_server_instance
 from komikku.servers import LANGUAGES
+from komikku.servers import ResponseCache
 from komikku.utils import create_cairo_surface_from_pixbuf
 from komikku.utils import html_escape
 from komikku.utils import log_error_traceback
 from komikku.utils import scale_pixbuf_animation
 
+MANGA_DATA_CACHE_TTL = 10 * 60  # in seconds
+MOST_POPULARS_CACHE_TTL = 60 * 60
+SEARCH_CACHE_TTL = 15 * 60
+
 
 @Gtk.Template.from_resource('/info/febvre/Komikku/ui/explorer.ui')
 class Explorer(Gtk.Stack):
@@ -69,6 +75,9 @@ class Explorer(Gtk.Stack):
 
         self.window = window
 
+        # Cache of search results, most popular results and manga data: avoid re-fetching them when navigating
+        self.cache = ResponseCache('explorer')
+
         self.title_label = self.window.explorer_title_label
 
         # Servers page
@@ -382,7 +391,7 @@ class Explorer(Gtk.Stack):
             self.window.show_notification(_('Oops, server website URL is unknown.'), 2)
 
     def on_server_clicked(self, listbox, row):
-        self.server = getattr(row.server_data['module'], row.server_data['class_name'])()
+        self.server = get_server_instance(row.server_data['id'])
         if hasattr(row, 'manga_data'):
             self.populate_card(row.manga_data)
         else:
@@ -399,7 +408,7 @@ class Explorer(Gtk.Stack):
     def populate_card(self, manga_data):
         def run(server, manga_slug):
             try:
-                current_manga_data = server.get_manga_data(manga_data)
+                current_manga_data = self.cache.call(MANGA_DATA_CACHE_TTL, server, 'get_manga_data', manga_data)
 
                 if current_manga_data is not None:
                     GLib.idle_add(complete, current_manga_data, server)
@@ -555,7 +564,7 @@ class Explorer(Gtk.Stack):
 
         if self.preselection and len(self.servers) == 1:
             row = self.servers_page_listbox.get_children()[1]
-            self.server = getattr(row.server_data['module'], row.server_data['class_name'])()
+            self.server = get_server_instance(row.server_data['id'])
             self.populate_card(row.manga_data)
         else:
             self.show_page('servers')
@@ -586,9 +595,9 @@ class Explorer(Gtk.Stack):
             try:
                 if most_populars:
                     # We offer most popular mangas as starting search results
-                    result = server.get_most_populars(**self.search_filters)
+                    result = self.cache.call(MOST_POPULARS_CACHE_TTL, server, 'get_most_populars', **self.search_filters)
                 else:
-                    result = server.search(term, **self.search_filters)
+                    result = self.cache.call(SEARCH_CACHE_TTL, server, 'search', term, **self.search_filters)
 
                 if result:
                     GLib.idle_add(complete, result, server, most_populars)
@@ -0,0 +1,138 @@
+# Copyright (C) 2019-2021 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+import argparse
+from contextlib import redirect_stdout
+import gi
+import json
+import logging
+import sys
+
+gi.require_version('Notify', '0.7')
+
+from gi.repository import Gio
+from gi.repository import GLib
+
+from komikku.downloader import Downloader
+from komikku.models import init_db
+from komikku.servers import get_transport_stats
+from komikku.updater import Updater
+
+logger = logging.getLogger('komikku.headless')
+
+
+class Headless:
+    """
+    Runs library updates and queued downloads without GTK window
+
+    Stands in for ApplicationWindow with Updater and Downloader: notifications are sent to the log
+    and a machine-readable summary is printed on stdout at the end.
+    """
+
+    def __init__(self):
+        self.loop = GLib.MainLoop()
+
+        self.downloader = Downloader(self)
+        self.updater = Updater(self)
+
+        self.summary = dict(
+            command=None,
+            offline=False,
+            updated_mangas=[],
+            new_chapters=0,
+            update_errors=0,
+            downloaded_chapters=[],
+            download_errors=[],
+        )
+
+        self.downloader.connect('download-changed', self.on_download_changed)
+        self.downloader.connect('ended', self.on_ended)
+        self.updater.connect('manga-updated', self.on_manga_updated)
+        self.updater.connect('ended', self.on_updater_ended)
+
+    @property
+    def network_available(self):
+        return Gio.NetworkMonitor.get_default().get_connectivity() == Gio.NetworkConnectivity.FULL
+
+    def on_download_changed(self, _downloader, download, chapter):
+        if chapter is not None:
+            if chapter.id not in self.summary['downloaded_chapters']:
+                self.summary['downloaded_chapters'].append(chapter.id)
+        elif download is not None and download.status == 'error':
+            if download.chapter_id not in self.summary['download_errors']:
+                self.summary['download_errors'].append(download.chapter_id)
+
+    def on_ended(self, *args):
+        if self.updater.running or self.downloader.running:
+            # New chapters may be auto downloaded after an update
+            return
+
+        self.loop.quit()
+
+    def on_manga_updated(self, _updater, manga, nb_recent_chapters, nb_deleted_chapters, _synced):
+        self.summary['updated_mangas'].append(dict(
+            id=manga.id,
+            name=manga.name,
+            server_id=manga.server_id,
+            new_chapters=nb_recent_chapters,
+            deleted_chapters=nb_deleted_chapters,
+        ))
+
+    def on_updater_ended(self, _updater, nb_recent_chapters, nb_errors):
+        self.summary['new_chapters'] = nb_recent_chapters
+        self.summary['update_errors'] = nb_errors
+
+        self.on_ended()
+
+    def run(self, command):
+        self.summary['command'] = command
+
+        if not self.network_available:
+            self.summary['offline'] = True
+            return self.summary
+
+        if command == 'update':
+            self.updater.update_library()
+        elif command == 'download':
+            self.downloader.start()
+
+        if self.updater.running or self.downloader.running:
+            try:
+                self.loop.run()
+            except KeyboardInterrupt:
+                self.downloader.stop()
+                self.updater.stop()
+
+        self.summary['transport'] = get_transport_stats()
+
+        return self.summary
+
+    def show_notification(self, message, interval=5):
+        logger.info(message.replace('\n', ' | '))
+
+
+def main(args):
+    parser = argparse.ArgumentParser(prog='komikku --headless', description='Update library or download queued chapters without GUI')
+    parser.add_argument('command', choices=('update', 'download'))
+    parser.add_argument('--debug', action='store_true', help='Enable debug logging')
+    options = parser.parse_args(args)
+
+    logging.basicConfig(
+        format='%(asctime)s | %(levelname)s | %(name)s | %(message)s', datefmt='%d-%m-%y %H:%M:%S',
+        level=logging.DEBUG if options.debug else logging.INFO,
+        stream=sys.stderr
+    )
+
+    # Keep stdout for the summary only
+    with redirect_stdout(sys.stderr):
+        init_db()
+
+    summary = Headless().run(options.command)
+
+    print(json.dumps(summary))
+
+    if summary['offline'] or summary['update_errors'] or summary['download_errors']:
+        return 1
+
+    return 0
@@ -2,9 +2,9 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
-from copy import deepcopy
 from gettext import gettext as _
 from gettext import ngettext as n_
+import logging
 import math
 import threading
 import time
@@ -15,25 +15,27 @@ from gi.repository import GLib
 from gi.repository import GObject
 from gi.repository import Gtk
 from gi.repository import Handy
-from gi.repository.GdkPixbuf import InterpType
 from gi.repository.GdkPixbuf import Pixbuf
-from gi.repository.GdkPixbuf import PixbufAnimation
 
+from komikku.covers_cache import covers_cache
 from komikku.models import Category
 from komikku.models import create_db_connection
 from komikku.models import delete_rows
 from komikku.models import insert_rows
 from komikku.models import Manga
 from komikku.models import Settings
-from komikku.models import update_rows
+from komikku.models import update_chapters_read_status
 from komikku.importer import import_from_file
-from komikku.servers import get_file_mime_type
 from komikku.utils import create_cairo_surface_from_pixbuf
-from komikku.utils import scale_pixbuf_animation
+
+LIBRARY_POPULATE_CHUNK_SIZE = 24  # Number of thumbnails added per main loop iteration (after the visible ones)
+
+logger = logging.getLogger('komikku')
 
 
 class Library:
     page = None
+    populate_generation = 0  # Incremented on each populate, allows to stop an uncompleted previous population
     search_menu_filters = {}
     selection_mode = False
     selection_mode_range = False
@@ -98,7 +100,7 @@ class Library:
             ret = term in manga.name.lower()
 
             # Search in server name
-            ret = ret or term in manga.server.name.lower()
+            ret = ret or term in manga.server_data['name'].lower()
 
             # Search in genres (exact match)
             if manga.genres:
@@ -456,25 +458,33 @@ class Library:
         self.window.download_manager.show()
 
     def populate(self):
+        start = time.monotonic()
+
         db_conn = create_db_connection()
 
         self.update_subtitle(db_conn=db_conn)
 
+        # Mangas are fetched in a single query, in the same order as flowbox sort (last read first)
         selected_category_id = Settings.get_default().selected_category
         if selected_category_id > 0:
             # A true (from DB) category is selected
             mangas_rows = db_conn.execute(
-                'SELECT m.id FROM categories_mangas_association cma JOIN mangas m ON cma.manga_id = m.id WHERE cma.category_id = ? ORDER BY m.last_read DESC',
+                'SELECT m.* FROM categories_mangas_association cma JOIN mangas m ON cma.manga_id = m.id WHERE cma.category_id = ? ORDER BY m.last_read DESC',
                 (selected_category_id,)
             ).fetchall()
         elif selected_category_id == -1:
             # Virtual category 'Uncategorized' is selected
             mangas_rows = db_conn.execute(
-                'SELECT id FROM mangas WHERE id not in (SELECT manga_id FROM categories_mangas_association) ORDER BY last_read DESC'
+                'SELECT * FROM mangas WHERE id not in (SELECT manga_id FROM categories_mangas_association) ORDER BY last_read DESC'
             ).fetchall()
         else:
             # Virtual category 'All' is selected
-            mangas_rows = db_conn.execute('SELECT id FROM mangas ORDER BY last_read DESC').fetchall()
+            mangas_rows = db_conn.execute('SELECT * FROM mangas ORDER BY last_read DESC').fetchall()
+
+        db_conn.close()
+
+        self.populate_generation += 1
+        generation = self.populate_generation
 
         if len(mangas_rows) == 0 and selected_category_id == 0:
             # Display start page
@@ -489,11 +499,36 @@ class Library:
             thumbnail.destroy()
 
         # Populate flowbox with mangas
+        # Visible thumbnails are added at once, others are added by chunks in idle time to not block the UI
         self.compute_thumbnails_size()
-        for row in mangas_rows:
-            self.add_manga(Manga.get(row['id'], db_conn=db_conn))
 
-        db_conn.close()
+        window_size = self.window.get_size()
+        nb_columns = max(window_size.width // (self.thumbnails_size[0] + 12), 1)
+        nb_rows = window_size.height // (self.thumbnails_size[1] + 12) + 1
+
+        def add_mangas(rows):
+            for row in rows:
+                self.add_manga(Manga(row))
+
+        def add_mangas_by_chunks():
+            # First iteration occurs after the first frame with visible thumbnails has been drawn
+            logger.debug('Library populate: first paint in {0:.1f}ms'.format((time.monotonic() - start) * 1000))
+
+            for index in range(nb_visible, len(mangas_rows), LIBRARY_POPULATE_CHUNK_SIZE):
+                if generation != self.populate_generation:
+                    # Library has been populated again in the meantime
+                    return
+
+                add_mangas(mangas_rows[index:index + LIBRARY_POPULATE_CHUNK_SIZE])
+                yield True
+
+            logger.debug('Library populate: {0} mangas in {1:.1f}ms'.format(len(mangas_rows), (time.monotonic() - start) * 1000))
+
+        nb_visible = nb_columns * nb_rows
+        add_mangas(mangas_rows[:nb_visible])
+
+        gen = add_mangas_by_chunks()
+        GLib.idle_add(lambda: next(gen, False), priority=GLib.PRIORITY_DEFAULT_IDLE)
 
     def search(self, _search_entry):
         self.flowbox.invalidate_filter()
@@ -614,26 +649,17 @@ class Library:
         for thumbnail in self.flowbox.get_selected_children():
             for chapter in thumbnail.manga.chapters:
                 last_page_read_index = None
-                if chapter.pages:
-                    pages = deepcopy(chapter.pages)
-                    for page in pages:
-                        page['read'] = read
-                else:
-                    pages = None
+                if not chapter.pages:
                     last_page_read_index = None if chapter.read == read == 0 else chapter.last_page_read_index
 
                 chapters_ids.append(chapter.id)
                 chapters_data.append(dict(
-                    pages=pages,
                     read=read,
                     recent=False,
                     last_page_read_index=last_page_read_index,
                 ))
 
-        db_conn = create_db_connection()
-        with db_conn:
-            update_rows(db_conn, 'chapters', chapters_ids, chapters_data)
-        db_conn.close()
+        update_chapters_read_status(chapters_ids, chapters_data, read)
 
         self.window.activity_indicator.stop()
         self.leave_selection_mode()
@@ -846,7 +872,6 @@ class Thumbnail(Gtk.FlowBoxChild):
         self.window = window
         self.manga = manga
 
-        self._cover_pixbuf = None
         self._server_logo_pixbuf = None
         self._filtered = False
         self._selected = False
@@ -922,22 +947,9 @@ class Thumbnail(Gtk.FlowBoxChild):
         draw_badge(nb_downloaded_chapters, 1, 0.266, 0.2)  # #FF4433
 
     def _draw_cover(self, context):
-        if self._cover_pixbuf is None:
-            if self.manga.cover_fs_path is None:
-                self._cover_pixbuf = Pixbuf.new_from_resource('/info/febvre/Komikku/images/missing_file.png')
-            else:
-                try:
-                    if get_file_mime_type(self.manga.cover_fs_path) != 'image/gif':
-                        self._cover_pixbuf = Pixbuf.new_from_file_at_scale(self.manga.cover_fs_path, 200, -1, True)
-                    else:
-                        animation_pixbuf = scale_pixbuf_animation(PixbufAnimation.new_from_file(self.manga.cover_fs_path), 200, -1, True)
-                        self._cover_pixbuf = animation_pixbuf.get_static_image()
-                except Exception:
-                    # Invalid image, corrupted image, unsupported image format,...
-                    self._cover_pixbuf = Pixbuf.new_from_resource('/info/febvre/Komikku/images/missing_file.png')
-
-        pixbuf = self._cover_pixbuf.scale_simple(
-            self.width * self.window.hidpi_scale, self.height * self.window.hidpi_scale, InterpType.BILINEAR)
+        # Thumbnail is scaled to current size (quantized) by a worker, a redraw is queued once it's ready
+        surface = covers_cache.get(
+            self.manga.cover_fs_path, self.width, self.height, self.window.hidpi_scale, self.drawing_area.queue_draw)
 
         radius = 6
         arc_0 = 0
@@ -945,6 +957,9 @@ class Thumbnail(Gtk.FlowBoxChild):
         arc_2 = math.pi
         arc_3 = math.pi * 1.5
 
+        # Clip and scale only apply to cover: badges and server logo are drawn with identity transform
+        context.save()
+
         context.new_sub_path()
         context.arc(self.width - radius, radius, radius, arc_3, arc_0)
         context.arc(self.width - radius, self.height - radius, radius, arc_0, arc_1)
@@ -954,17 +969,21 @@ class Thumbnail(Gtk.FlowBoxChild):
 
         context.clip()
 
-        context.scale(1 / self.window.hidpi_scale, 1 / self.window.hidpi_scale)
+        if surface is not None:
+            # Thumbnail size can differ slightly (quantized size) or not (previous size while current one is prepared)
+            scale_x, scale_y = surface.get_device_scale()
+            context.scale(self.width * scale_x / surface.get_width(), self.height * scale_y / surface.get_height())
+            context.set_source_surface(surface, 0, 0)
+            context.paint()
 
-        Gdk.cairo_set_source_pixbuf(context, pixbuf, 0, 0)
-        context.paint()
+        context.restore()
 
     def _draw_name(self):
         self.name_label.set_text(self.manga.name)
 
     def _draw_server_logo(self, context):
         if self._server_logo_pixbuf is None:
-            logo_path = self.manga.server.logo_path
+            logo_path = self.manga.server_data['logo_path']
             if logo_path is not None:
                 self._server_logo_pixbuf = Pixbuf.new_from_file_at_scale(
                     logo_path, 20 * self.window.hidpi_scale, 20 * self.window.hidpi_scale, True)
@@ -984,7 +1003,7 @@ class Thumbnail(Gtk.FlowBoxChild):
 
     def update(self, manga):
         self.manga = manga
-        self._cover_pixbuf = None
+        covers_cache.invalidate(self.manga.cover_fs_path)
 
         self._draw_name()
         # Schedule a redraw to update drawing areas (cover, server logo and badges)
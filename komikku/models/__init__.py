@@ -8,9 +8,11 @@ from .database import Chapter
 from .database import create_db_connection
 from .database import delete_rows
 from .database import Download
+from .database import get_servers_disk_usage
 from .database import init_db
 from .database import insert_rows
 from .database import Manga
+from .database import update_chapters_read_status
 from .database import update_rows
 
 from .settings import Settings
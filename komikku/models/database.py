@@ -5,24 +5,35 @@
 import datetime
 from functools import lru_cache
 from gettext import gettext as _
-import importlib
 import json
 import logging
 import os
-from PIL import Image
 import sqlite3
 import shutil
+import threading
 
-from komikku.servers import convert_image
+from komikku.models.settings import Settings
 from komikku.servers import get_server_class_name_by_id
+from komikku.servers import get_server_data
 from komikku.servers import get_server_dir_name_by_id
+from komikku.servers import get_server_instance
 from komikku.servers import get_server_module_name_by_id
-from komikku.servers import unscramble_image
+from komikku.servers import save_page_image
+from komikku.servers import split_page_image
+from komikku.utils import BORDERS_CROP_THRESHOLD
+from komikku.utils import compute_borders_crop_bbox
 from komikku.utils import get_data_dir
 
 logger = logging.getLogger('komikku')
 
-VERSION = 8
+VERSION = 9
+
+# Fetches in progress of chapters data (page index None) and pages, shared by all Chapter instances
+# (reader, prefetcher, downloader): {(chapter ID, page index): threading.Event}
+chapters_fetches = {}
+chapters_fetches_lock = threading.Lock()
+# Serializes writes of chapters pages data, see Chapter._save_page()
+chapters_pages_lock = threading.Lock()
 
 
 def adapt_json(data):
@@ -79,6 +90,34 @@ def create_db_connection():
     return con
 
 
+def compute_unknown_chapters_disk_usage(db_conn, manga_id=None):
+    """Computes and records pages sizes and disk usage of chapters for which it's unknown (chapters of a DB prior to version 9)"""
+    if manga_id is not None:
+        rows = db_conn.execute('SELECT id, manga_id FROM chapters WHERE disk_usage IS NULL AND manga_id = ?', (manga_id,)).fetchall()
+    else:
+        rows = db_conn.execute('SELECT id, manga_id FROM chapters WHERE disk_usage IS NULL').fetchall()
+
+    mangas = {}
+    for row in rows:
+        if row['manga_id'] not in mangas:
+            mangas[row['manga_id']] = Manga.get(row['manga_id'], db_conn=db_conn)
+
+        chapter = Chapter.get(row['id'], manga=mangas[row['manga_id']], db_conn=db_conn)
+
+        pages = chapter.pages or []
+        for index, page in enumerate(pages):
+            path = chapter.get_page_path(index)
+            if path is None:
+                page['size'] = 0
+                continue
+
+            page['size'] = os.path.getsize(path)
+            if segments := chapter.get_page_segments(index):
+                page['size'] += sum(os.path.getsize(segment_path) for segment_path, _height in segments)
+
+        update_row(db_conn, 'chapters', chapter.id, dict(pages=chapter.pages, disk_usage=get_pages_disk_usage(pages)))
+
+
 def execute_sql(conn, sql):
     try:
         c = conn.cursor()
@@ -101,6 +140,26 @@ def get_db_backup_path():
     return os.path.join(get_data_dir(), 'komikku_backup.db')
 
 
+def get_pages_disk_usage(pages):
+    """Returns the size in bytes of files of a chapter's pages (recorded in pages data when they are fetched)"""
+    return sum(page.get('size') or 0 for page in pages or [])
+
+
+def get_servers_disk_usage():
+    """Returns recorded sizes in bytes of chapters' pages, aggregated by server: {server ID: size}"""
+    db_conn = create_db_connection()
+    with db_conn:
+        compute_unknown_chapters_disk_usage(db_conn)
+
+        rows = db_conn.execute(
+            'SELECT m.server_id, sum(c.disk_usage) AS disk_usage FROM chapters c JOIN mangas m ON m.id = c.manga_id GROUP BY m.server_id'
+        ).fetchall()
+
+    db_conn.close()
+
+    return {row['server_id']: row['disk_usage'] or 0 for row in rows}
+
+
 def init_db():
     db_path = get_db_path()
     db_backup_path = get_db_backup_path()
@@ -145,6 +204,7 @@ def init_db():
         recent integer NOT NULL,
         read integer NOT NULL,
         last_page_read_index integer,
+        disk_usage integer DEFAULT 0, -- size in bytes of chapter's folder, NULL if unknown
         UNIQUE (slug, manga_id)
     );"""
 
@@ -254,6 +314,13 @@ def init_db():
             if res:
                 db_conn.execute('PRAGMA user_version = {0}'.format(8))
 
+        if 0 < db_version <= 8:
+            # Version 0.32.0
+            # Disk usage of chapters which may have files is unknown, it will be computed once when needed
+            if execute_sql(db_conn, 'ALTER TABLE chapters ADD COLUMN disk_usage integer DEFAULT 0;') and \
+                    execute_sql(db_conn, 'UPDATE chapters SET disk_usage = NULL WHERE pages IS NOT NULL;'):
+                db_conn.execute('PRAGMA user_version = {0}'.format(9))
+
         print('DB version', db_conn.execute('PRAGMA user_version').fetchone()[0])
 
         db_conn.close()
@@ -308,6 +375,34 @@ def insert_rows(db_conn, table, data):
         return False
 
 
+def update_chapters_read_status(ids, data, read):
+    """Updates chapters and read status of their pages
+
+    Pages data are re-read from DB and merged under lock (see Chapter._save_page()), only read status of pages is changed.
+
+    :param list ids: chapters IDs
+    :param list data: fields to update of each chapter, merged pages are added in them
+    :param bool read: read status of pages
+    :return: True on success False otherwise
+    """
+    with chapters_pages_lock:
+        db_conn = create_db_connection()
+        with db_conn:
+            for id, chapter_data in zip(ids, data):
+                row = db_conn.execute('SELECT pages FROM chapters WHERE id = ?', (id,)).fetchone()
+
+                pages = row['pages'] if row is not None else None
+                for page in pages or []:
+                    page['read'] = read
+                chapter_data['pages'] = pages
+
+            ret = update_rows(db_conn, 'chapters', ids, data)
+
+        db_conn.close()
+
+    return ret
+
+
 def update_row(db_conn, table, id, data):
     try:
         db_conn.execute(
@@ -346,10 +441,14 @@ class Manga:
         hiatus=_('Hiatus'),
     )
 
-    def __init__(self, server=None):
+    def __init__(self, row=None, server=None):
         if server:
             self._server = server
 
+        if row is not None:
+            for key in row.keys():
+                setattr(self, key, row[key])
+
     @classmethod
     def get(cls, id, server=None, db_conn=None):
         if db_conn is not None:
@@ -362,11 +461,7 @@ class Manga:
         if row is None:
             return None
 
-        manga = cls(server=server)
-        for key in row.keys():
-            setattr(manga, key, row[key])
-
-        return manga
+        return cls(row, server=server)
 
     @classmethod
     def new(cls, data, server, long_strip_detection):
@@ -462,6 +557,23 @@ class Manga:
     def dir_name(self):
         return get_server_dir_name_by_id(self.server_id)
 
+    @property
+    def disk_usage(self):
+        """Size in bytes of manga's folder: recorded sizes of chapters' pages and cover size"""
+        db_conn = create_db_connection()
+        with db_conn:
+            compute_unknown_chapters_disk_usage(db_conn, self.id)
+
+            row = db_conn.execute('SELECT sum(disk_usage) AS disk_usage FROM chapters WHERE manga_id = ?', (self.id,)).fetchone()
+
+        db_conn.close()
+
+        size = row['disk_usage'] or 0
+        if cover_fs_path := self.cover_fs_path:
+            size += os.path.getsize(cover_fs_path)
+
+        return size
+
     @property
     def module_name(self):
         return get_server_module_name_by_id(self.server_id)
@@ -506,11 +618,22 @@ class Manga:
     @property
     def server(self):
         if self._server is None:
-            module = importlib.import_module('.' + self.module_name, package='komikku.servers')
-            self._server = getattr(module, self.class_name)()
+            self._server = get_server_instance(self.server_id)
 
         return self._server
 
+    @property
+    def server_data(self):
+        """Server metadata (name, lang, logo path,...), server is not instantiated when it's listed in manifest"""
+        if server_data := get_server_data(self.server_id):
+            return server_data
+
+        return dict(
+            name=self.server.name,
+            lang=self.server.lang,
+            logo_path=self.server.logo_path,
+        )
+
     def _save_cover(self, url):
         if url is None:
             return
@@ -776,14 +899,26 @@ class Chapter:
         if os.path.exists(self.path):
             shutil.rmtree(self.path)
 
-    def get_page(self, page_index):
-        if not self.pages or not self.pages[page_index]:
+    def _compute_page_borders_crop_bbox(self, page_index, path):
+        """Computes page borders crop bbox and stores it in page data (not persisted), returns None on failure"""
+        try:
+            bbox = compute_borders_crop_bbox(path)
+        except Exception as e:
+            logger.warning(f'Failed to compute borders crop bbox of page {path}: {e}')
             return None
 
-        page_path = self.get_page_path(page_index)
-        if page_path:
-            return page_path
+        self.pages[page_index]['borders_crop'] = dict(
+            bbox=bbox,
+            threshold=BORDERS_CROP_THRESHOLD,
+        )
+
+        return bbox
+
+    def _end_fetch(self, page_index=None):
+        with chapters_fetches_lock:
+            chapters_fetches.pop((self.id, page_index)).set()
 
+    def _fetch_page(self, page_index):
         data = self.manga.server.get_manga_chapter_page_image(self.manga.slug, self.manga.name, self.slug, self.pages[page_index])
         if data is None:
             return None
@@ -791,36 +926,151 @@ class Chapter:
         if not os.path.exists(self.path):
             os.makedirs(self.path, exist_ok=True)
 
-        image = data['buffer']
         page_path = os.path.join(self.path, data['name'])
+        info = save_page_image(data['buffer'], data['mime_type'], page_path, scrambled=self.scrambled)
 
-        if data['mime_type'] == 'image/webp' or self.scrambled:
-            if data['mime_type'] == 'image/webp':
-                image = convert_image(image)
+        page = self.pages[page_index]
+        if page['image'] is None:
+            page['image'] = data['name']
 
-            if self.scrambled:
-                image = unscramble_image(image)
+        # Size on disk of page files (chapter disk usage is the sum of its pages sizes)
+        # A page fetched again (corrupt file) overwrites its previous size
+        page['size'] = info['size']
 
-        if isinstance(image, Image.Image):
-            image.save(page_path)
-        else:
-            with open(page_path, 'wb') as fp:
-                fp.write(image)
+        if info['width'] and info['height']:
+            # Allows reader to size page before image is decoded
+            page['width'] = info['width']
+            page['height'] = info['height']
 
-        updated_data = {}
-        if self.pages[page_index]['image'] is None:
-            self.pages[page_index]['image'] = data['name']
-            updated_data['pages'] = self.pages
+            split_height = Settings.get_default().long_strip_split_height
+            if split_height and info['height'] > split_height:
+                # Oversized long-strip page: store it also split in segments (Webtoon pager only decodes visible ones)
+                # Segments belong to the same page, reading progress is unchanged
+                page['segments'] = split_page_image(page_path, split_height)
+                if page['segments']:
+                    page['size'] += sum(segment['size'] for segment in page['segments'])
 
-        downloaded = len(next(os.walk(self.path))[2]) == len(self.pages)
-        if downloaded != self.downloaded:
-            updated_data['downloaded'] = downloaded
+        if self.manga.borders_crop == 1:
+            # Compute borders crop bbox once for all, while we are off main thread
+            self._compute_page_borders_crop_bbox(page_index, page_path)
 
-        if updated_data:
-            self.update(updated_data)
+        self._save_page(page_index)
+
+        # Hidden files (pages being written) are ignored
+        downloaded = len([name for name in next(os.walk(self.path))[2] if not name.startswith('.')]) == len(self.pages)
+        if downloaded != self.downloaded:
+            self.update(dict(downloaded=downloaded))
 
         return page_path
 
+    def _refresh(self):
+        """Reloads chapter data from DB, after a fetch done by another instance"""
+        db_conn = create_db_connection()
+        row = db_conn.execute('SELECT * FROM chapters WHERE id = ?', (self.id,)).fetchone()
+        db_conn.close()
+
+        if row is not None:
+            for key in row.keys():
+                setattr(self, key, row[key])
+
+    def _save_page(self, page_index):
+        """Persists data of a page (image name, size, dimensions, segments, borders crop bbox,...) and chapter disk usage
+
+        Pages of a chapter can be updated concurrently by several instances (reader, prefetcher, downloader, images workers).
+        To not lose updates, pages data are re-read from DB and the page is merged in them under a lock.
+        """
+        with chapters_pages_lock:
+            db_conn = create_db_connection()
+            with db_conn:
+                row = db_conn.execute('SELECT pages, disk_usage FROM chapters WHERE id = ?', (self.id,)).fetchone()
+                if row is not None and row['pages']:
+                    pages = row['pages']
+                    # Read status is not owned by fetches, see set_page_read() and update_chapters_read_status()
+                    if 'read' in pages[page_index]:
+                        self.pages[page_index]['read'] = pages[page_index]['read']
+                    else:
+                        self.pages[page_index].pop('read', None)
+                    pages[page_index] = self.pages[page_index]
+
+                    data = dict(pages=pages)
+                    if row['disk_usage'] is not None:
+                        # Unknown disk usage (DB prior to version 9) is computed later, see compute_unknown_chapters_disk_usage()
+                        data['disk_usage'] = get_pages_disk_usage(pages)
+
+                    update_row(db_conn, 'chapters', self.id, data)
+
+                    for key in data:
+                        setattr(self, key, data[key])
+
+            db_conn.close()
+
+    def _start_fetch(self, page_index=None):
+        """Registers a fetch of chapter data (page_index None) or of a page
+
+        If the same fetch is already in progress (in another thread), waits for its end and returns False.
+        Otherwise, returns True: caller must do the fetch and then call _end_fetch().
+        """
+        key = (self.id, page_index)
+
+        with chapters_fetches_lock:
+            event = chapters_fetches.get(key)
+            if event is None:
+                chapters_fetches[key] = threading.Event()
+                return True
+
+        event.wait()
+        self._refresh()
+
+        return False
+
+    def get_page(self, page_index):
+        if not self.pages or not self.pages[page_index]:
+            return None
+
+        page_path = self.get_page_path(page_index)
+        if page_path:
+            return page_path
+
+        if not self._start_fetch(page_index):
+            # Page has been fetched in the meantime by another thread (reader, prefetcher or downloader)
+            return self.get_page_path(page_index)
+
+        try:
+            return self._fetch_page(page_index)
+        finally:
+            self._end_fetch(page_index)
+
+    def get_page_borders_crop_bbox(self, page_index):
+        """Returns the borders crop bbox of a page
+
+        Bbox is stored in page data. It's (re)computed if missing or computed with another threshold.
+        """
+        data = self.pages[page_index].get('borders_crop')
+        if data is not None and data['threshold'] == BORDERS_CROP_THRESHOLD:
+            return tuple(data['bbox']) if data['bbox'] else None
+
+        path = self.get_page_path(page_index)
+        if path is None:
+            return None
+
+        bbox = self._compute_page_borders_crop_bbox(page_index, path)
+        if 'borders_crop' in self.pages[page_index]:
+            # Called from images workers: page is merged in pages data persisted by other instances
+            self._save_page(page_index)
+
+        return bbox
+
+    def get_page_dimensions(self, page_index):
+        """Returns page image (width, height) if known (stored when page is fetched), None otherwise"""
+        if not self.pages or page_index < 0 or page_index >= len(self.pages):
+            return None
+
+        page = self.pages[page_index]
+        if not page.get('width') or not page.get('height'):
+            return None
+
+        return page['width'], page['height']
+
     def get_page_path(self, page_index):
         if self.pages and self.pages[page_index]['image'] is not None:
             # self.pages[page_index]['image'] can be an image name or an image url (path + eventually a query string)
@@ -836,6 +1086,61 @@ class Chapter:
 
         return None
 
+    def get_page_segments(self, page_index):
+        """Returns the segments [(path, height), ...] of a page split at download time, None if page is not split"""
+        segments = self.pages[page_index].get('segments')
+        if not segments:
+            return None
+
+        paths_heights = []
+        for segment in segments:
+            path = os.path.join(self.path, segment['image'])
+            if not os.path.exists(path):
+                return None
+
+            paths_heights.append((path, segment['height']))
+
+        return paths_heights
+
+    def is_page_fetching(self, page_index):
+        """Returns True if page is being fetched (by any Chapter instance)"""
+        with chapters_fetches_lock:
+            return (self.id, page_index) in chapters_fetches
+
+    def remove_page(self, page_index):
+        """Removes files of a page (corrupt image), page will be fetched again"""
+        page = self.pages[page_index]
+
+        path = self.get_page_path(page_index)
+        paths = [path] if path else []
+        paths += [os.path.join(self.path, segment['image']) for segment in page.get('segments') or []]
+        for path in paths:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+        page.pop('segments', None)
+        page['size'] = 0
+        self._save_page(page_index)
+
+        if self.downloaded:
+            self.update(dict(downloaded=0))
+
+    def remove_page_segments(self, page_index):
+        """Removes segments of a page (one of them can't be decoded), full page image is used instead"""
+        page = self.pages[page_index]
+
+        for segment in page.pop('segments', None) or []:
+            try:
+                os.unlink(os.path.join(self.path, segment['image']))
+            except OSError:
+                pass
+
+        path = self.get_page_path(page_index)
+        page['size'] = os.path.getsize(path) if path else 0
+        self._save_page(page_index)
+
     def reset(self):
         if os.path.exists(self.path):
             shutil.rmtree(self.path)
@@ -845,8 +1150,40 @@ class Chapter:
             downloaded=0,
             read=0,
             last_page_read_index=None,
+            disk_usage=0,
         ))
 
+    def set_page_read(self, page_index):
+        """Marks a page as read and updates chapter reading progress
+
+        Pages data are re-read from DB and merged under lock, see _save_page()
+
+        :param int page_index: index of page
+        :return: True if chapter has been fully read
+        """
+        with chapters_pages_lock:
+            db_conn = create_db_connection()
+            with db_conn:
+                row = db_conn.execute('SELECT pages FROM chapters WHERE id = ?', (self.id,)).fetchone()
+                pages = row['pages'] if row is not None and row['pages'] else self.pages
+
+                pages[page_index]['read'] = True
+                data = dict(
+                    pages=pages,
+                    last_page_read_index=page_index,
+                    read=all(page.get('read') for page in pages),
+                    recent=0,
+                )
+
+                update_row(db_conn, 'chapters', self.id, data)
+
+            db_conn.close()
+
+        for key in data:
+            setattr(self, key, data[key])
+
+        return data['read']
+
     def update(self, data):
         """
         Updates specific fields
@@ -878,11 +1215,18 @@ class Chapter:
         if self.pages:
             return True
 
-        data = self.manga.server.get_manga_chapter_data(self.manga.slug, self.manga.name, self.slug, self.url)
-        if data is None or not data['pages']:
-            return False
+        if not self._start_fetch():
+            # Chapter data has been fetched in the meantime by another thread
+            return bool(self.pages)
+
+        try:
+            data = self.manga.server.get_manga_chapter_data(self.manga.slug, self.manga.name, self.slug, self.url)
+            if data is None or not data['pages']:
+                return False
 
-        return self.update(data)
+            return self.update(data)
+        finally:
+            self._end_fetch()
 
 
 class Category:
@@ -112,6 +112,14 @@ class Settings(Gio.Settings):
     def fullscreen(self, state):
         self.set_boolean('fullscreen', state)
 
+    @property
+    def images_cache_size(self):
+        return self.get_int('images-cache-size')
+
+    @images_cache_size.setter
+    def images_cache_size(self, value):
+        self.set_int('images-cache-size', value)
+
     @property
     def long_strip_detection(self):
         return self.get_boolean('long-strip-detection')
@@ -120,6 +128,14 @@ class Settings(Gio.Settings):
     def long_strip_detection(self, state):
         self.set_boolean('long-strip-detection', state)
 
+    @property
+    def long_strip_split_height(self):
+        return self.get_int('long-strip-split-height')
+
+    @long_strip_split_height.setter
+    def long_strip_split_height(self, value):
+        self.set_int('long-strip-split-height', value)
+
     @property
     def new_chapters_auto_download(self):
         return self.get_boolean('new-chapters-auto-download')
@@ -5,13 +5,18 @@
 from gettext import gettext as _
 
 from gi.repository import Gio
+from gi.repository import GLib
 from gi.repository import Gtk
 from gi.repository import Handy
 
+from komikku.models import get_servers_disk_usage
 from komikku.models import Settings
+from komikku.servers import get_server_class
+from komikku.servers import get_server_data
 from komikku.servers import get_server_main_id_by_id
 from komikku.servers import get_servers_list
 from komikku.servers import LANGUAGES
+from komikku.servers import remove_server_instances
 from komikku.utils import KeyringHelper
 
 
@@ -311,6 +316,8 @@ class PreferencesServersSettingsSubpage:
         self.parent = parent
         self.settings = Settings.get_default()
         self.keyring_helper = KeyringHelper()
+        # Rows of servers, disk usage is displayed in subtitles
+        self.rows = {}
 
         settings = self.settings.servers_settings
         languages = self.settings.servers_languages
@@ -322,9 +329,10 @@ class PreferencesServersSettingsSubpage:
 
             if main_id not in servers_data:
                 servers_data[main_id] = dict(
+                    id=server_data['id'],
                     main_id=main_id,
                     name=server_data['name'],
-                    module=server_data['module'],
+                    has_login=server_data['has_login'],
                     langs=[],
                 )
 
@@ -335,8 +343,7 @@ class PreferencesServersSettingsSubpage:
             if not server_data['langs']:
                 continue
 
-            server_class = getattr(server_data['module'], server_data['main_id'].capitalize())
-            has_login = getattr(server_class, 'has_login')
+            has_login = server_data['has_login']
 
             server_settings = settings.get(server_main_id)
             server_enabled = server_settings is None or server_settings['enabled'] is True
@@ -352,6 +359,7 @@ class PreferencesServersSettingsSubpage:
                 expander_row.add(vbox)
 
                 self.parent.servers_settings_subpage_group.add(expander_row)
+                self.rows[server_main_id] = expander_row
 
                 if len(server_data['langs']) > 1:
                     for lang in server_data['langs']:
@@ -371,6 +379,10 @@ class PreferencesServersSettingsSubpage:
                         vbox.add(hbox)
 
                 if has_login:
+                    # Servers with login are few, only their modules are imported
+                    # Main server is not always in manifest (ex. 'yieha:izneo'), its first server is used instead
+                    server_class = get_server_class(get_server_data(server_main_id) or get_server_data(server_data['id']))
+
                     frame = Gtk.Frame()
                     vbox.add(frame)
 
@@ -445,6 +457,7 @@ class PreferencesServersSettingsSubpage:
                 action_row.add(switch)
 
                 self.parent.servers_settings_subpage_group.add(action_row)
+                self.rows[server_main_id] = action_row
 
         self.parent.servers_settings_subpage_group.show_all()
 
@@ -459,6 +472,7 @@ class PreferencesServersSettingsSubpage:
 
     def present(self, _widget):
         self.parent.subtitle_label.set_text(_('Servers Settings'))
+        self.set_disk_usage()
         self.parent.subpages_stack.set_visible_child_name('servers_settings')
         self.parent.set_visible_child_name('subpages')
 
@@ -477,6 +491,10 @@ class PreferencesServersSettingsSubpage:
 
         if server.logged_in:
             button.set_image(Gtk.Image.new_from_icon_name('object-select-symbolic', Gtk.IconSize.BUTTON))
+
+            # Shared instances of server must be recreated with new credentials
+            remove_server_instances(server_main_id)
+
             if self.keyring_helper.is_disabled or plaintext_checkbutton is not None and not plaintext_checkbutton.get_active():
                 return
 
@@ -487,3 +505,13 @@ class PreferencesServersSettingsSubpage:
             self.keyring_helper.store(server_main_id, username, password, address)
         else:
             button.set_image(Gtk.Image.new_from_icon_name('computer-fail-symbolic', Gtk.IconSize.BUTTON))
+
+    def set_disk_usage(self):
+        servers_disk_usage = {}
+        for server_id, disk_usage in get_servers_disk_usage().items():
+            main_id = get_server_main_id_by_id(server_id)
+            servers_disk_usage[main_id] = servers_disk_usage.get(main_id, 0) + disk_usage
+
+        for server_main_id, row in self.rows.items():
+            disk_usage = servers_disk_usage.get(server_main_id)
+            row.set_subtitle(GLib.format_size(disk_usage) if disk_usage else '')
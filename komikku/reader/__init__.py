@@ -14,7 +14,9 @@ from gi.repository import Gtk
 from komikku.models import Settings
 from komikku.reader.controls import Controls
 from komikku.reader.pager import Pager
+from komikku.reader.pager.images_cache import images_cache
 from komikku.reader.pager.webtoon import WebtoonPager
+from komikku.reader.prefetcher import Prefetcher
 from komikku.servers import get_file_mime_type
 from komikku.utils import is_flatpak
 
@@ -48,6 +50,9 @@ class Reader:
         # Controls
         self.controls = Controls(self)
 
+        # Pages prefetcher
+        self.prefetcher = Prefetcher(self)
+
     @property
     def background_color(self):
         return self.manga.background_color or Settings.get_default().background_color
@@ -112,6 +117,13 @@ class Reader:
         self.save_page_action.connect('activate', self.save_page)
         self.window.application.add_action(self.save_page_action)
 
+    def close(self):
+        """Called when user leaves reader"""
+        self.remove_pager()
+
+        # Free memory used by decoded and prepared pages images
+        images_cache.clear()
+
     def init(self, manga, chapter):
         self.manga = manga
 
@@ -190,6 +202,8 @@ class Reader:
         self.pager.rescale_pages()
 
     def remove_pager(self):
+        self.prefetcher.stop()
+
         if self.pager:
             self.pager.clear()
             self.pager.destroy()
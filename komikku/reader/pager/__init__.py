@@ -146,9 +146,13 @@ class BasePager:
         vadj = page.scrolledwindow.get_vadjustment()
 
         if self.zoom['active'] is False:
+            imagebuf = page.get_imagebuf()
+            if imagebuf is None:
+                return
+
             self.set_interactive(False)
 
-            pixbuf = page.imagebuf.get_pixbuf()
+            pixbuf = imagebuf.get_pixbuf()
 
             # Record hadjustment and vadjustment values
             self.zoom['orig_hadj_value'] = hadj.get_value()
@@ -269,23 +273,8 @@ class BasePager:
         # Update manga last read time
         self.reader.manga.update(dict(last_read=datetime.datetime.utcnow()))
 
-        # Mark page as read
-        chapter.pages[page.index]['read'] = True
-
-        # Check if chapter has been fully read
-        chapter_is_read = True
-        for chapter_page in reversed(chapter.pages):
-            if not chapter_page.get('read'):
-                chapter_is_read = False
-                break
-
-        # Update chapter
-        chapter.update(dict(
-            pages=chapter.pages,
-            last_page_read_index=page.index,
-            read=chapter_is_read,
-            recent=0,
-        ))
+        # Mark page as read and update chapter (check if chapter has been fully read)
+        chapter_is_read = chapter.set_page_read(page.index)
 
         self.sync_progress_with_server(page, chapter_is_read)
 
@@ -549,6 +538,8 @@ class Pager(Handy.Carousel, BasePager):
             if index != 1:
                 # Add next page depending of navigation direction
                 self.add_page('start' if index == 0 else 'end')
+
+            self.reader.prefetcher.update(page.chapter, page.index)
         elif page.index == 0:
             self.window.show_notification(_('This chapter is inaccessible.'), 2)
 
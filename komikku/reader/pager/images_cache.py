@@ -0,0 +1,129 @@
+# Copyright (C) 2019-2021 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import os
+import threading
+
+from gi.repository.GdkPixbuf import Pixbuf
+
+from komikku.models import Settings
+
+logger = logging.getLogger('komikku.reader')
+
+# Pages images (and long-strip pages segments) are decoded, cropped and scaled by a pool of workers,
+# only the result is set in main thread
+IMAGE_WORKERS = min(4, os.cpu_count() or 1)
+image_workers = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='komikku-page-image')
+
+
+class ImagesCache:
+    """Memory-budgeted LRU cache of decoded (Imagebuf) and prepared (scaled pixbufs and surfaces) pages images
+
+    Shared by all pagers. Thread-safe: it's filled by images workers and read by them.
+    """
+
+    def __init__(self, size=None):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.used = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.__size = size
+
+    @property
+    def size(self):
+        """Budget in bytes"""
+        if self.__size is None:
+            self.__size = Settings.get_default().images_cache_size * 1024 * 1024
+
+        return self.__size
+
+    @staticmethod
+    def get_imagebuf_nbytes(imagebuf):
+        buffer = imagebuf._buffer
+        if isinstance(buffer, bytes):
+            return len(buffer)
+
+        return buffer.get_byte_length()
+
+    @staticmethod
+    def get_prepared_nbytes(pixbuf, surface):
+        nbytes = 0
+        if isinstance(pixbuf, Pixbuf):
+            nbytes += pixbuf.get_byte_length()
+        if surface is not None:
+            nbytes += surface.get_stride() * surface.get_height()
+
+        return nbytes
+
+    def _evict(self):
+        while self.used > self.size and self.entries:
+            _key, (_value, nbytes) = self.entries.popitem(last=False)
+            self.used -= nbytes
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.used = 0
+
+    def get(self, key, stats=True):
+        """Returns cached value of `key` or None
+
+        :param stats: whether lookup is accounted in hits/misses stats (False for fallback lookups)
+        """
+        with self.lock:
+            if key not in self.entries:
+                if stats:
+                    self.misses += 1
+                return None
+
+            self.entries.move_to_end(key)
+            if stats:
+                self.hits += 1
+
+            return self.entries[key][0]
+
+    def get_stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+
+            return dict(
+                entries=len(self.entries),
+                used=self.used,
+                size=self.size,
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                hit_rate=round(self.hits / total, 3) if total else 0,
+            )
+
+    def invalidate(self, path):
+        """Removes all entries of an image file"""
+        with self.lock:
+            for key in [key for key in self.entries if key[1] == path]:
+                _value, nbytes = self.entries.pop(key)
+                self.used -= nbytes
+
+    def set(self, key, value, nbytes):
+        if nbytes > self.size:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.used -= self.entries.pop(key)[1]
+
+            self.entries[key] = (value, nbytes)
+            self.used += nbytes
+
+            self._evict()
+
+
+images_cache = ImagesCache()
@@ -3,7 +3,10 @@
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
 from gettext import gettext as _
+import logging
+import os
 import threading
+import time
 
 from gi.repository import GLib
 from gi.repository import GObject
@@ -11,11 +14,18 @@ from gi.repository import Gtk
 from gi.repository.GdkPixbuf import PixbufAnimation
 
 from komikku.activity_indicator import ActivityIndicator
+from komikku.reader.pager.images_cache import image_workers
+from komikku.reader.pager.images_cache import images_cache
+from komikku.reader.pager.tiled_image import TiledImage
+from komikku.reader.pager.tiled_image import TILED_RENDERING_MIN_HEIGHT
+from komikku.reader.pager.tiled_image import TiledImageSource
 from komikku.utils import create_cairo_surface_from_pixbuf
 from komikku.utils import crop_pixbuf
 from komikku.utils import Imagebuf
 from komikku.utils import log_error_traceback
 
+logger = logging.getLogger('komikku.reader')
+
 
 class Page(Gtk.Overlay):
     __gsignals__ = {
@@ -38,6 +48,9 @@ class Page(Gtk.Overlay):
         self.loadable = False  # loadable from disk or downloadable from server (chapter pages are known)
 
         self.cropped = False
+        self.image_future = None
+        self.image_generation = 0  # Incremented each time image is requested, allows to drop outdated results
+        self.render_retry = False
         self.last_hadj_value = None
         self.last_vadj_value = None
 
@@ -49,6 +62,10 @@ class Page(Gtk.Overlay):
         self.viewport = Gtk.Viewport()
         self.image = Gtk.Image()
         self.imagebuf = None
+        # Very tall images are rendered by tiles in Webtoon reading mode
+        self.tiled_image = TiledImage() if self.reader.reading_mode == 'webtoon' else None
+        if self.tiled_image is not None:
+            self.tiled_image.connect('source-failed', self.on_tiled_image_source_failed)
         self.viewport.add(self.image)
         self.scrolledwindow.add(self.viewport)
         self.add(self.scrolledwindow)
@@ -80,7 +97,7 @@ class Page(Gtk.Overlay):
 
     @property
     def animated(self):
-        return self.imagebuf.animated
+        return self.imagebuf is not None and self.imagebuf.animated
 
     @property
     def loaded(self):
@@ -92,8 +109,26 @@ class Page(Gtk.Overlay):
 
         self.status = 'cleaned'
         self.loadable = False
+        self.cancel_image()
         self.imagebuf = None
         self.image.clear()
+        if self.tiled_image is not None:
+            self.tiled_image.clear()
+
+    def cancel_image(self):
+        """Cancels pending image preparation (if not started yet) and ignores its result"""
+        self.image_generation += 1
+
+        if self.image_future is not None:
+            self.image_future.cancel()
+            self.image_future = None
+
+    def get_imagebuf(self):
+        """Returns page decoded image, decodes it if page doesn't hold it (prepared image came from images cache)"""
+        if self.imagebuf is None and self.path is not None:
+            self.imagebuf = Imagebuf.new_from_file(self.path)
+
+        return self.imagebuf
 
     def on_button_retry_clicked(self, button):
         button.destroy()
@@ -145,6 +180,14 @@ class Page(Gtk.Overlay):
         elif type == 'vertical' and vadj.get_upper() > self.reader.size.height:
             self.last_vadj_value = vadj.get_value()
 
+    def on_tiled_image_source_failed(self, _tiled_image):
+        if self.status == 'cleaned':
+            return
+
+        # A segment of page can't be decoded: segments are removed, full page image is used instead
+        self.chapter.remove_page_segments(self.index)
+        self.set_image()
+
     def render(self, retry=False):
         def complete(error_code, error_message):
             self.activity_indicator.stop()
@@ -161,10 +204,14 @@ class Page(Gtk.Overlay):
                 # Page has been removed from pager
                 return False
 
+            if self.reader.reading_mode == 'webtoon':
+                # Chapter pages are now known, placeholder can be sized before image is decoded
+                self.set_size()
+
+            # Status will be set to `rendered` and `rendered` signal emitted once image is set
+            self.render_retry = retry
             self.status = 'render'
             self.set_image()
-            self.status = 'rendered'
-            self.emit('rendered', retry)
 
             return False
 
@@ -239,6 +286,7 @@ class Page(Gtk.Overlay):
         if self.status is not None and self.error is None:
             return
 
+        self.cancel_image()
         self.imagebuf = None
         self.status = 'rendering'
         self.error = None
@@ -259,50 +307,169 @@ class Page(Gtk.Overlay):
         if self.status == 'rendered':
             self.set_image()
 
-    def set_image(self, crop=None):
-        if self.imagebuf is None:
-            if self.path is None:
-                self.imagebuf = Imagebuf.new_from_resource('/info/febvre/Komikku/images/missing_file.png')
-            else:
-                self.imagebuf = Imagebuf.new_from_file(self.path)
-                if self.imagebuf is None:
-                    GLib.unlink(self.path)
+    def on_image_prepared(self, generation, future, queued_time):
+        if generation != self.image_generation or future.cancelled() or self.status == 'cleaned':
+            # Page has been cleaned or a new image has been requested in the meantime
+            return False
 
-                    self.show_retry_button()
-                    self.window.show_notification(_('Failed to load image'), 2)
+        self.image_future = None
 
-                    self.error = 'corrupt_file'
-                    self.imagebuf = Imagebuf.new_from_resource('/info/febvre/Komikku/images/missing_file.png')
-        else:
+        try:
+            imagebuf, pixbuf, surface, cropped, tiled, prepare_time = future.result()
+        except Exception as e:
+            log_error_traceback(e)
+
+            if self.status == 'render':
+                self.status = 'rendered'
+                self.emit('rendered', self.render_retry)
+            return False
+
+        start = time.monotonic()
+
+        if pixbuf is None:
+            # Corrupt file
+            images_cache.invalidate(self.path)
+            self.chapter.remove_page(self.index)
+
+            self.show_retry_button()
+            self.window.show_notification(_('Failed to load image'), 2)
+
+            self.error = 'corrupt_file'
+            self.imagebuf = Imagebuf.new_from_resource('/info/febvre/Komikku/images/missing_file.png')
+            self.set_image()
+            return False
+
+        # imagebuf is None if prepared image comes from images cache and page doesn't hold its decoded image (see get_imagebuf)
+        self.imagebuf = imagebuf
+        self.cropped = cropped
+
+        if tiled:
+            # pixbuf is the unscaled source image (TiledImageSource), only its visible tiles will be scaled
+            self.tiled_image.set_source(pixbuf, self.reader.size.width, self.window.hidpi_scale, self.reader.size.height)
+            self.show_image_widget(self.tiled_image)
             self.image.clear()
 
+            self.set_size_request(self.tiled_image.width, self.tiled_image.height)
+        else:
+            if isinstance(pixbuf, PixbufAnimation):
+                self.image.set_from_animation(pixbuf)
+            elif surface is not None:
+                self.image.set_from_surface(surface)
+            else:
+                self.image.set_from_pixbuf(pixbuf)
+
+            if self.tiled_image is not None:
+                self.show_image_widget(self.image)
+                self.tiled_image.clear()
+
+            if self.reader.reading_mode == 'webtoon':
+                self.set_size_request(pixbuf.get_width() / self.window.hidpi_scale, pixbuf.get_height() / self.window.hidpi_scale)
+
+        if self.status == 'render':
+            self.status = 'rendered'
+            self.emit('rendered', self.render_retry)
+
+        logger.debug('Page {0} image: {1:.1f}ms in worker, {2:.1f}ms in main thread ({3:.1f}ms since request) | cache: {4}'.format(
+            self.index, prepare_time * 1000, (time.monotonic() - start) * 1000, (time.monotonic() - queued_time) * 1000,
+            images_cache.get_stats()))
+
+        return False
+
+    def prepare_image(self, imagebuf, path, params, chapter=None, index=None):
+        """Decodes, crops and scales page image (runs in a worker thread)
+
+        Returns a tuple (imagebuf, pixbuf, surface, cropped, tiled, time), pixbuf is None if file is corrupt.
+        If tiled is True, pixbuf is the unscaled source image (TiledImageSource): it's scaled by tiles in main thread
+        (see TiledImage) and imagebuf is None when page has been split in segments at download time (nothing is decoded here).
+
+        Cached prepared images don't include the decoded image (its memory wouldn't be accounted in images cache budget):
+        in case of cache hit, the given imagebuf (possibly None) is returned as is.
+        """
+        start = time.monotonic()
+
+        # Only images loaded from files are cached (not the `missing file` image)
+        cache_path = path if imagebuf is None or imagebuf.path is not None else None
+        if cache_path is not None:
+            try:
+                mtime = os.stat(cache_path).st_mtime_ns
+            except OSError:
+                mtime = None
+
+            prepared_key = ('prepared', cache_path, mtime) + tuple(params[name] for name in sorted(params))
+            if prepared := images_cache.get(prepared_key):
+                return (imagebuf, ) + prepared + (time.monotonic() - start, )
+
+        if params['tiled'] and imagebuf is None and chapter is not None and not params['crop']:
+            segments = chapter.get_page_segments(index)
+            dimensions = chapter.get_page_dimensions(index)
+            if segments and dimensions:
+                # Page has been split in segments at download time: only segments of visible tiles will be decoded
+                bbox = chapter.get_page_borders_crop_bbox(index) if params['borders_crop'] else None
+                source = TiledImageSource.new_from_segments(segments, dimensions[0], bbox)
+
+                return None, source, None, False, True, time.monotonic() - start
+
+        if imagebuf is None:
+            if path is None:
+                imagebuf = Imagebuf.new_from_resource('/info/febvre/Komikku/images/missing_file.png')
+            else:
+                imagebuf_key = ('imagebuf', path, mtime)
+                # Prepared image lookup has already been accounted in cache stats
+                imagebuf = images_cache.get(imagebuf_key, stats=False)
+                if imagebuf is None:
+                    imagebuf = Imagebuf.new_from_file(path)
+                    if imagebuf is None:
+                        return None, None, None, False, False, time.monotonic() - start
+
+                    images_cache.set(imagebuf_key, imagebuf, images_cache.get_imagebuf_nbytes(imagebuf))
+
+        width = params['width']
+        height = params['height']
+        hidpi_scale = params['hidpi_scale']
+        crop = params['crop']
+
+        # Decoded imagebuf is returned, not the cropped one
+        decoded_imagebuf = imagebuf
+
         # Crop image borders
-        imagebuf = self.imagebuf.crop_borders() if self.reader.manga.borders_crop == 1 else self.imagebuf
+        if params['borders_crop']:
+            if cache_path is not None and chapter is not None:
+                # Use bbox stored in page data (computed only once)
+                bbox = chapter.get_page_borders_crop_bbox(index)
+                if bbox is not None:
+                    imagebuf = imagebuf.crop_borders(bbox)
+            else:
+                imagebuf = imagebuf.crop_borders()
+
+        if params['tiled'] and not imagebuf.animated and crop is None:
+            if imagebuf.height * width / imagebuf.width * hidpi_scale > TILED_RENDERING_MIN_HEIGHT:
+                # Very tall image: don't scale it entirely, only visible tiles will be (not cached, tiles are)
+                return decoded_imagebuf, TiledImageSource.new_from_pixbuf(imagebuf.get_pixbuf()), None, False, True, time.monotonic() - start
 
         # Adjust image
-        scaling = self.reader.scaling if self.reader.reading_mode != 'webtoon' else 'width'
-        if self.reader.scaling != 'original':
-            adapt_to_width_height = imagebuf.height / (imagebuf.width / self.reader.size.width)
-            adapt_to_height_width = imagebuf.width / (imagebuf.height / self.reader.size.height)
+        if params['scaling'] != 'original':
+            adapt_to_width_height = imagebuf.height / (imagebuf.width / width)
+            adapt_to_height_width = imagebuf.width / (imagebuf.height / height)
 
-            if not self.animated:
-                if scaling == 'width' or (scaling == 'screen' and adapt_to_width_height <= self.reader.size.height):
+            if not imagebuf.animated:
+                scaling = params['scaling']
+                if scaling == 'width' or (scaling == 'screen' and adapt_to_width_height <= height):
                     # Adapt image to width
-                    pixbuf = imagebuf.get_scaled_pixbuf(self.reader.size.width, adapt_to_width_height, False, self.window.hidpi_scale)
-                elif scaling == 'height' or (scaling == 'screen' and adapt_to_height_width <= self.reader.size.width):
+                    pixbuf = imagebuf.get_scaled_pixbuf(width, adapt_to_width_height, False, hidpi_scale)
+                elif scaling == 'height' or (scaling == 'screen' and adapt_to_height_width <= width):
                     # Adapt image to height
-                    pixbuf = imagebuf.get_scaled_pixbuf(adapt_to_height_width, self.reader.size.height, False, self.window.hidpi_scale)
+                    pixbuf = imagebuf.get_scaled_pixbuf(adapt_to_height_width, height, False, hidpi_scale)
             else:
                 # NOTE: Special case of animated images (GIF)
                 # They cannot be cropped, which would prevent navigation by 2-finger swipe gesture
                 # Moreover, it's more comfortable to view them in their entirety (fit viewport)
 
-                if adapt_to_width_height <= self.reader.size.height:
+                if adapt_to_width_height <= height:
                     # Adapt image to width
-                    pixbuf = imagebuf.get_scaled_pixbuf(self.reader.size.width, adapt_to_width_height, False, self.window.hidpi_scale)
-                elif adapt_to_height_width <= self.reader.size.width:
+                    pixbuf = imagebuf.get_scaled_pixbuf(width, adapt_to_width_height, False, hidpi_scale)
+                elif adapt_to_height_width <= width:
                     # Adapt image to height
-                    pixbuf = imagebuf.get_scaled_pixbuf(adapt_to_height_width, self.reader.size.height, False, self.window.hidpi_scale)
+                    pixbuf = imagebuf.get_scaled_pixbuf(adapt_to_height_width, height, False, hidpi_scale)
         else:
             pixbuf = imagebuf.get_pixbuf()
 
@@ -313,38 +480,73 @@ class Page(Gtk.Overlay):
                 pixbuf = crop_pixbuf(
                     pixbuf,
                     0, 0,
-                    self.reader.size.width * self.window.hidpi_scale, self.reader.size.height * self.window.hidpi_scale
+                    width * hidpi_scale, height * hidpi_scale
                 )
             elif crop == 'left':
                 pixbuf = crop_pixbuf(
                     pixbuf,
-                    pixbuf.get_width() - self.reader.size.width * self.window.hidpi_scale, 0,
-                    self.reader.size.width * self.window.hidpi_scale, self.reader.size.height * self.window.hidpi_scale
+                    pixbuf.get_width() - width * hidpi_scale, 0,
+                    width * hidpi_scale, height * hidpi_scale
                 )
             elif crop == 'top':
                 pixbuf = crop_pixbuf(
                     pixbuf,
-                    0, pixbuf.get_height() - self.reader.size.height * self.window.hidpi_scale,
-                    self.reader.size.width * self.window.hidpi_scale, self.reader.size.height * self.window.hidpi_scale
+                    0, pixbuf.get_height() - height * hidpi_scale,
+                    width * hidpi_scale, height * hidpi_scale
                 )
-            self.cropped = True
-        else:
-            self.cropped = False
 
-        if isinstance(pixbuf, PixbufAnimation):
-            self.image.set_from_animation(pixbuf)
-        else:
-            if self.window.hidpi_scale != 1:
-                surface = create_cairo_surface_from_pixbuf(pixbuf, self.window.hidpi_scale)
-                self.image.set_from_surface(surface)
-            else:
-                self.image.set_from_pixbuf(pixbuf)
+        surface = None
+        if not isinstance(pixbuf, PixbufAnimation) and hidpi_scale != 1:
+            surface = create_cairo_surface_from_pixbuf(pixbuf, hidpi_scale)
+
+        prepared = (pixbuf, surface, crop is not None, False)
+        if cache_path is not None and not isinstance(pixbuf, PixbufAnimation):
+            images_cache.set(prepared_key, prepared, images_cache.get_prepared_nbytes(pixbuf, surface))
 
-        if self.reader.reading_mode == 'webtoon':
-            self.set_size_request(pixbuf.get_width() / self.window.hidpi_scale, pixbuf.get_height() / self.window.hidpi_scale)
+        return (decoded_imagebuf, ) + prepared + (time.monotonic() - start, )
+
+    def set_image(self, crop=None):
+        """Requests page image for current reader size and settings
+
+        Image is prepared by a worker, only the result is set in main thread (see on_image_prepared).
+        """
+        self.cancel_image()
+
+        params = dict(
+            width=self.reader.size.width,
+            height=self.reader.size.height,
+            hidpi_scale=self.window.hidpi_scale,
+            scaling=self.reader.scaling if self.reader.reading_mode != 'webtoon' else 'width',
+            borders_crop=self.reader.manga.borders_crop == 1,
+            crop=crop,
+            tiled=self.tiled_image is not None,
+        )
+
+        generation = self.image_generation
+        queued_time = time.monotonic()
+        self.image_future = image_workers.submit(self.prepare_image, self.imagebuf, self.path, params, self.chapter, self.index)
+        self.image_future.add_done_callback(lambda future: GLib.idle_add(self.on_image_prepared, generation, future, queued_time))
 
     def set_size(self):
-        self.set_size_request(self.reader.size.width, self.reader.size.height)
+        width = self.reader.size.width
+        height = self.reader.size.height
+
+        if self.reader.reading_mode == 'webtoon' and self.chapter is not None:
+            # Size placeholder to image size when it's known, avoids scroll jumps when image is set
+            if dimensions := self.chapter.get_page_dimensions(self.index):
+                height = round(width * dimensions[1] / dimensions[0])
+
+        self.set_size_request(width, height)
+
+    def show_image_widget(self, widget):
+        """Swaps viewport child between image and tiled image widgets"""
+        child = self.viewport.get_child()
+        if child is widget:
+            return
+
+        self.viewport.remove(child)
+        self.viewport.add(widget)
+        widget.show()
 
     def show_retry_button(self):
         button = Gtk.Button.new()
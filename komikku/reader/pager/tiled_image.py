@@ -0,0 +1,253 @@
+# Copyright (C) 2019-2021 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+from collections import OrderedDict
+import itertools
+import logging
+import math
+
+from gi.repository import Gdk
+from gi.repository import GLib
+from gi.repository import GObject
+from gi.repository import Gtk
+from gi.repository.GdkPixbuf import Colorspace
+from gi.repository.GdkPixbuf import InterpType
+from gi.repository.GdkPixbuf import Pixbuf
+
+from komikku.reader.pager.images_cache import image_workers
+from komikku.reader.pager.images_cache import images_cache
+from komikku.utils import create_cairo_surface_from_pixbuf
+
+TILE_HEIGHT = 512  # in logical pixels
+TILES_CACHE_VIEWPORTS = 3  # Tiles cache can hold tiles of 3 viewports (visible one, before and after)
+
+# Images (scaled to width) taller than this height (in device pixels) are rendered by tiles
+TILED_RENDERING_MIN_HEIGHT = 4096
+
+logger = logging.getLogger('komikku.reader')
+
+
+class TiledImage(Gtk.DrawingArea):
+    """Image widget which scales and draws only the horizontal bands (tiles) of the source image visible in viewport
+
+    Used by Webtoon pager for very tall long-strip images: scaling them entirely (and copying them again in a cairo surface
+    in HiDPI) can cost hundreds of MB per page. Scaled tiles are kept in a cache shared by all tiled images
+    and bounded by viewport size, memory is therefore proportional to viewport size, not to images height.
+    """
+
+    __gsignals__ = {
+        'source-failed': (GObject.SIGNAL_RUN_FIRST, None, ()),
+    }
+
+    ids = itertools.count()
+    tiles = OrderedDict()  # Shared LRU cache of tiles cairo surfaces
+    tiles_max = 0
+
+    def __init__(self):
+        Gtk.DrawingArea.__init__(self)
+
+        self.id = next(self.ids)
+        self.source = None
+        self.hidpi_scale = 1
+        self.width = 0
+        self.height = 0
+
+        self.connect('draw', self._draw)
+
+    @classmethod
+    def _add_tile(cls, key, surface):
+        cls.tiles[key] = surface
+        while len(cls.tiles) > cls.tiles_max:
+            cls.tiles.popitem(last=False)
+
+    def _draw(self, _drawing_area, context):
+        if self.source is None:
+            return
+
+        has_clip, rect = Gdk.cairo_get_clip_rectangle(context)
+        if has_clip:
+            first = max(rect.y // TILE_HEIGHT, 0)
+            last = min((rect.y + rect.height - 1) // TILE_HEIGHT, self.nb_tiles - 1)
+        else:
+            first, last = 0, self.nb_tiles - 1
+
+        for index in range(first, last + 1):
+            surface = self.get_tile(index)
+            if surface is None:
+                # Segments of tile are being decoded, tile will be drawn once they are ready
+                continue
+
+            context.set_source_surface(surface, 0, index * TILE_HEIGHT)
+            context.rectangle(0, index * TILE_HEIGHT, self.width, surface.get_height() / self.hidpi_scale)
+            context.fill()
+
+    @property
+    def nb_tiles(self):
+        return math.ceil(self.height / TILE_HEIGHT)
+
+    def clear(self):
+        self.source = None
+        self.remove_tiles()
+
+    def get_tile(self, index):
+        """Returns tile surface, None if segments it needs are not decoded yet (they are requested to images workers)"""
+        key = (self.id, index)
+        if key in self.tiles:
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+
+        # Render tile: only its area of the scaled image is computed
+        device_width = round(self.width * self.hidpi_scale)
+        device_height = round(self.height * self.hidpi_scale)
+        device_y = round(index * TILE_HEIGHT * self.hidpi_scale)
+        tile_height = min(round(TILE_HEIGHT * self.hidpi_scale), device_height - device_y)
+
+        scale_x = device_width / self.source.width
+        scale_y = device_height / self.source.height
+        origin_x, origin_y = self.source.bbox[:2]
+
+        # Bands overlapping tile: (pixbuf, top and bottom positions in tile)
+        bands = []
+        for band_index, (band_y, band_height, _band) in enumerate(self.source.bands):
+            top = round((band_y - origin_y) * scale_y) - device_y
+            bottom = round((band_y + band_height - origin_y) * scale_y) - device_y
+            if bottom <= 0 or top >= tile_height:
+                continue
+
+            bands.append((self.source.get_band_pixbuf(band_index, self.on_band_decoded), top, bottom))
+
+        if any(band_pixbuf is None for band_pixbuf, _top, _bottom in bands):
+            return None
+
+        pixbuf = Pixbuf.new(Colorspace.RGB, self.source.has_alpha, 8, device_width, tile_height)
+        for band_pixbuf, top, bottom in bands:
+            band_pixbuf.scale(
+                pixbuf,
+                0, max(top, 0), device_width, min(bottom, tile_height) - max(top, 0),
+                -origin_x * scale_x, top,
+                scale_x, scale_y,
+                InterpType.BILINEAR
+            )
+
+        surface = create_cairo_surface_from_pixbuf(pixbuf, self.hidpi_scale)
+        self._add_tile(key, surface)
+
+        return surface
+
+    def on_band_decoded(self, source, success):
+        if source is not self.source:
+            # Source has been changed in the meantime
+            return
+
+        if success:
+            self.queue_draw()
+        else:
+            # A segment can't be decoded, its tiles would stay blank: another source (full image) must be set
+            self.clear()
+            self.emit('source-failed')
+
+    def remove_tiles(self):
+        for key in [key for key in self.tiles if key[0] == self.id]:
+            del self.tiles[key]
+
+    def set_source(self, source, width, hidpi_scale, viewport_height):
+        """Sets source (a TiledImageSource), image is scaled to `width` (in logical pixels)"""
+        self.remove_tiles()
+
+        self.source = source
+        self.hidpi_scale = hidpi_scale
+        self.width = width
+        self.height = round(source.height * width / source.width)
+
+        TiledImage.tiles_max = max(TiledImage.tiles_max, TILES_CACHE_VIEWPORTS * (math.ceil(viewport_height / TILE_HEIGHT) + 1))
+
+        self.set_size_request(self.width, self.height)
+        self.queue_draw()
+
+
+class TiledImageSource:
+    """Unscaled source image of a TiledImage
+
+    Made of one or several horizontal bands: a single decoded pixbuf or the segments of a page split at download time.
+    Segments are only decoded (by images workers) when a visible tile needs them. An optional crop box (borders crop) can be applied.
+    """
+
+    def __init__(self, bands, width, height, bbox=None, has_alpha=False):
+        self.bands = bands  # [(y, height, pixbuf or file path), ...]
+        self.bbox = tuple(bbox) if bbox else (0, 0, width, height)
+        self.has_alpha = has_alpha
+
+        self.failed = set()  # Indexes of bands (segments) which can't be decoded
+        self.loading = set()  # Indexes of bands (segments) being decoded
+
+    @classmethod
+    def new_from_pixbuf(cls, pixbuf):
+        width = pixbuf.get_width()
+        height = pixbuf.get_height()
+
+        return cls([(0, height, pixbuf)], width, height, has_alpha=pixbuf.get_has_alpha())
+
+    @classmethod
+    def new_from_segments(cls, segments, width, bbox=None):
+        """
+        :param segments: list of (path, height)
+        :param width: width of segments
+        :param bbox: optional crop box in full image coordinates
+        """
+        bands = []
+        y = 0
+        for path, height in segments:
+            bands.append((y, height, path))
+            y += height
+
+        return cls(bands, width, y, bbox)
+
+    @property
+    def height(self):
+        return self.bbox[3] - self.bbox[1]
+
+    @property
+    def width(self):
+        return self.bbox[2] - self.bbox[0]
+
+    def get_band_pixbuf(self, index, callback):
+        """Returns the pixbuf of a band, None if it's a segment which is not decoded yet
+
+        Segments are decoded by images workers (never in main thread), `callback(source, success)` is called in main thread
+        once it's done. Must be called from main thread.
+        """
+        band = self.bands[index][2]
+        if isinstance(band, Pixbuf):
+            return band
+
+        key = ('segment', band)
+        pixbuf = images_cache.get(key)
+        if pixbuf is not None or index in self.loading or index in self.failed:
+            return pixbuf
+
+        self.loading.add(index)
+
+        def run():
+            try:
+                pixbuf = Pixbuf.new_from_file(band)
+            except GLib.GError as e:
+                logger.info(f'Failed to load page segment {band}: {e}')
+                pixbuf = None
+            else:
+                images_cache.set(key, pixbuf, pixbuf.get_byte_length())
+
+            GLib.idle_add(complete, pixbuf)
+
+        def complete(pixbuf):
+            self.loading.discard(index)
+            if pixbuf is None:
+                self.failed.add(index)
+
+            callback(self, pixbuf is not None)
+
+            return False
+
+        image_workers.submit(run)
+
+        return None
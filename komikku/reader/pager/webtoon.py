@@ -2,6 +2,7 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
+from bisect import bisect_right
 from gettext import gettext as _
 
 from gi.repository import Gdk
@@ -19,6 +20,7 @@ class WebtoonPager(Gtk.Box, BasePager):
     current_page = None
     current_page_scroll_value = 0
     nb_preloaded_pages = 3  # Number of preloaded pages before and after the center/visible page
+    pages_offsets_index = None  # Cached pages and prefix sums of their heights, see pages_offsets
     scroll_direction = None
 
     render_pages_counter = 10
@@ -43,15 +45,21 @@ class WebtoonPager(Gtk.Box, BasePager):
 
     @property
     def pages_offsets(self):
-        pages = self.pages
+        """Offsets of pages (prefix sums of their heights)
+
+        Computed only when pages are added, removed or resized (see invalidate_pages_offsets), not on every scroll event.
+        """
+        if self.pages_offsets_index is None:
+            pages = self.pages
+
+            offsets = [0]
+            for page in pages[:-1]:
+                _minimal, natural = page.get_preferred_size()
+                offsets.append(offsets[-1] + natural.height)
 
-        offsets = [0]
-        for index, page in enumerate(pages[:-1]):
-            prev = offsets[index]
-            _minimal, natural = page.get_preferred_size()
-            offsets.append(prev + natural.height)
+            self.pages_offsets_index = (pages, offsets)
 
-        return offsets
+        return self.pages_offsets_index[1]
 
     def add_page(self, position):
         pages = self.pages
@@ -75,8 +83,11 @@ class WebtoonPager(Gtk.Box, BasePager):
             self.add(new_page)
 
         new_page.status_changed_handler_id = new_page.connect('notify::status', self.on_page_status_changed)
+        new_page.connect('notify::height-request', self.invalidate_pages_offsets)
         new_page.connect('rendered', self.on_page_rendered)
 
+        self.invalidate_pages_offsets()
+
     def adjust_scroll(self, value=None, emit_signal=True):
         if value is None:
             value = self.get_page_offset(self.current_page) + self.current_page_scroll_value
@@ -101,27 +112,24 @@ class WebtoonPager(Gtk.Box, BasePager):
         BasePager.clear(self)
 
     def get_page_offset(self, page):
-        pages = self.pages
+        offsets = self.pages_offsets
+        pages = self.pages_offsets_index[0]
 
-        offset = 0
-        for p in pages:
-            if page == p:
-                break
-            _minimal, natural = p.get_preferred_size()
-            offset += natural.height
+        if page in pages:
+            return offsets[pages.index(page)]
+        if not pages:
+            return 0
 
-        return offset
+        _minimal, natural = pages[-1].get_preferred_size()
+
+        return offsets[-1] + natural.height
 
     def get_position(self, scroll_value):
-        pages_offsets = self.pages_offsets
-        position = None
+        offsets = self.pages_offsets
 
-        for i, page_offset in enumerate(reversed(pages_offsets)):
-            if scroll_value >= page_offset:
-                position = len(pages_offsets) - 1 - i
-                break
+        position = bisect_right(offsets, scroll_value) - 1
 
-        return position
+        return position if position >= 0 else None
 
     def goto_page(self, index):
         self.init(self.current_page.chapter, index)
@@ -140,17 +148,23 @@ class WebtoonPager(Gtk.Box, BasePager):
         for i in range(-self.nb_preloaded_pages, self.nb_preloaded_pages + 1):
             page = Page(self, chapter, page_index + i)
             page.status_changed_handler_id = page.connect('notify::status', self.on_page_status_changed)
+            page.connect('notify::height-request', self.invalidate_pages_offsets)
             page.connect('rendered', self.on_page_rendered)
             self.add(page)
             if i == 0:
                 self.current_page = page
                 page.render()
 
+        self.invalidate_pages_offsets()
+
         self.render_pages_timeout_id = GLib.timeout_add(500, self.render_pages)
         GLib.idle_add(self.update, self.current_page)
 
         self.set_interactive(True)
 
+    def invalidate_pages_offsets(self, *args):
+        self.pages_offsets_index = None
+
     def on_key_press(self, _widget, event):
         if self.window.page != 'reader' or self.scroll_lock:
             return Gdk.EVENT_PROPAGATE
@@ -186,6 +200,9 @@ class WebtoonPager(Gtk.Box, BasePager):
         return Gdk.EVENT_PROPAGATE
 
     def on_page_status_changed(self, page, _param):
+        # Page size may change when its image is set
+        self.invalidate_pages_offsets()
+
         if page.status == 'rendering':
             return
 
@@ -321,6 +338,7 @@ class WebtoonPager(Gtk.Box, BasePager):
 
         if page.loadable:
             self.set_interactive(True)
+            self.reader.prefetcher.update(page.chapter, page.index)
 
         # Update title, initialize controls and notify user if chapter changed
         if self.current_chapter_id != page.chapter.id:
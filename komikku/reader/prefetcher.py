@@ -0,0 +1,150 @@
+# Copyright (C) 2019-2021 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+from collections import deque
+import logging
+import threading
+import time
+
+from komikku.downloader import DOWNLOAD_DELAY
+from komikku.utils import log_error_traceback
+
+PREFETCH_HORIZON = 30  # in seconds, pages which should be read during this delay are prefetched
+PREFETCH_MIN_PAGES = 3
+PREFETCH_MAX_PAGES = 10
+
+logger = logging.getLogger('komikku.reader')
+
+
+class Prefetcher:
+    """
+    Fetches in background the next pages the user is about to read (in reading direction)
+
+    The number of prefetched pages depends on reading speed. When the end (or the start) of the current chapter is near,
+    pages list of the next (or previous) chapter is resolved and its first (or last) pages are prefetched.
+    Pages are fetched one by one with the same delay as downloads. Pages already being fetched by reader or downloader
+    are skipped: chapters fetches are coordinated by Chapter (a page is never fetched twice concurrently).
+    """
+
+    def __init__(self, reader):
+        self.reader = reader
+
+        self.condition = threading.Condition()
+        self.thread = None
+        self.target = None  # (chapter, page index, direction, number of pages)
+        self.generation = 0  # Incremented on each target change
+        self.current_generation = 0  # Generation of the target being processed
+        self.stop_flag = False
+
+        self.last_position = None
+        self.times = deque(maxlen=10)
+
+    @property
+    def nb_pages(self):
+        """Number of pages to prefetch, depending on reading speed"""
+        if len(self.times) < 2:
+            return PREFETCH_MIN_PAGES
+
+        speed = (len(self.times) - 1) / max(self.times[-1] - self.times[0], 1)  # pages per second
+
+        return max(PREFETCH_MIN_PAGES, min(PREFETCH_MAX_PAGES, round(speed * PREFETCH_HORIZON)))
+
+    def get_targets(self, chapter, index, direction, nb_pages):
+        """Yields (chapter, page index) of pages to prefetch, resolves next/previous chapter pages if needed"""
+        count = 0
+        while count < nb_pages:
+            index += direction
+
+            if index < 0 or index >= len(chapter.pages):
+                chapter = self.reader.manga.get_next_chapter(chapter, direction)
+                if chapter is None:
+                    return
+
+                if not chapter.pages:
+                    if not self.is_current():
+                        return
+
+                    logger.debug(f'Prefetch | Resolve pages of chapter {chapter.title}')
+                    if not chapter.update_full() or not chapter.pages:
+                        return
+                    self.wait(DOWNLOAD_DELAY)
+
+                index = 0 if direction == 1 else len(chapter.pages) - 1
+
+            yield chapter, index
+            count += 1
+
+    def is_current(self):
+        """Returns False if target has changed or prefetcher has been stopped"""
+        return not self.stop_flag and self.generation == self.current_generation
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.target is None and not self.stop_flag:
+                    self.condition.wait()
+
+                if self.stop_flag:
+                    self.thread = None
+                    return
+
+                chapter, index, direction, nb_pages = self.target
+                self.target = None
+                self.current_generation = self.generation
+
+            if not self.reader.window.network_available:
+                continue
+
+            try:
+                for target_chapter, target_index in self.get_targets(chapter, index, direction, nb_pages):
+                    if not self.is_current():
+                        break
+
+                    if target_chapter.get_page_path(target_index) is not None or target_chapter.is_page_fetching(target_index):
+                        # Page is already available or is being fetched by reader or downloader
+                        continue
+
+                    logger.debug(f'Prefetch | Page {target_index + 1} of chapter {target_chapter.title}')
+                    target_chapter.get_page(target_index)
+                    self.wait(DOWNLOAD_DELAY)
+            except Exception as e:
+                log_error_traceback(e)
+
+    def stop(self):
+        with self.condition:
+            self.stop_flag = True
+            self.target = None
+            self.last_position = None
+            self.times.clear()
+            self.condition.notify_all()
+
+    def update(self, chapter, index):
+        """Called when current page changes"""
+        if not chapter.pages:
+            return
+
+        position = (chapter.rank, index)
+        if position == self.last_position:
+            return
+
+        direction = -1 if self.last_position is not None and position < self.last_position else 1
+        self.last_position = position
+        self.times.append(time.monotonic())
+
+        with self.condition:
+            self.stop_flag = False
+            self.generation += 1
+            self.target = (chapter, index, direction, self.nb_pages)
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run)
+                self.thread.daemon = True
+                self.thread.start()
+
+            self.condition.notify_all()
+
+    def wait(self, delay):
+        """Waits between two requests, returns early if target changes"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.stop_flag or self.target is not None, timeout=delay)
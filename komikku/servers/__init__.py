@@ -4,15 +4,18 @@
 
 from bs4 import BeautifulSoup
 from bs4 import NavigableString
-import dateparser
+from collections import OrderedDict
+from copy import deepcopy
 import datetime
 from functools import cached_property
 from functools import lru_cache
 from functools import wraps
-import gi
+import hashlib
 import importlib
+import importlib.util
 import inspect
 import io
+import json
 import logging
 import magic
 from operator import itemgetter
@@ -20,20 +23,61 @@ import os
 import pickle
 from PIL import Image
 import pkgutil
+import re
 import requests
+from requests.adapters import HTTPAdapter
 from requests.adapters import TimeoutSauce
 import struct
-
-gi.require_version('Gtk', '3.0')
-gi.require_version('WebKit2', '4.0')
-
-from gi.repository import GLib
-from gi.repository import Gtk
-from gi.repository import WebKit2
+import threading
+import time
+from urllib3 import HTTPConnectionPool
+from urllib3 import HTTPSConnectionPool
+from urllib3 import PoolManager
+from urllib3.util import Retry
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 from komikku.utils import get_cache_dir
+from komikku.utils import get_pixbuf_mime_types
 from komikku.utils import KeyringHelper
 
+# Formats tried (after the one given by the server) before falling back to dateparser
+# Common unambiguous formats only: day/month order of numeric dates ('03/04/2021') depends on server, it's left to dateparser
+DATE_FORMATS = (
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%Y/%m/%d',
+    '%Y.%m.%d',
+    '%B %d, %Y',
+    '%b %d, %Y',
+    '%b %d,%y',
+    '%d %B %Y',
+    '%d %b %Y',
+    '%d %b. %Y',
+)
+DATE_RELATIVE_RE = re.compile(
+    r'^(?P<count>\d+|an?|one)\s+(?P<unit>second|minute|min|hour|day|week|month|year)s?\s+ago$', re.IGNORECASE)
+DATE_RELATIVE_UNITS = dict(
+    second='seconds',
+    minute='minutes',
+    min='minutes',
+    hour='hours',
+    day='days',
+    week='weeks',
+)
+
+# Scramble schemes: moves of bands of pixels along x axis (columns) then y axis (rows), as (method, bands size)
+# See get_unscramble_bands_moves()
+SCRAMBLE_SCHEMES = dict(
+    default=dict(
+        columns=('swap', 100),
+        rows=('swap', 100),
+    ),
+)
+
 # https://www.localeplanet.com/icu/
 LANGUAGES = dict(
     ar='العربية',
@@ -59,6 +103,10 @@ LANGUAGES = dict(
     zh_Hant='中文 (繁體)',
 )
 
+PAGES_SEGMENTS_DIR_NAME = '.segments'  # Sub-folder of chapter folder in which long-strip pages segments are stored
+
+REQUESTS_POOL_CONNECTIONS = 32  # Number of hosts for which a connections pool is kept
+REQUESTS_POOL_MAXSIZE = 10  # Number of connections kept alive per host
 REQUESTS_TIMEOUT = 5
 
 USER_AGENT = 'Mozilla/5.0 (X11; Linux x86_64; rv:86.0) Gecko/20100101 Firefox/86.0'
@@ -68,6 +116,9 @@ VERSION = 1
 
 logger = logging.getLogger('komikku.servers')
 
+servers_instances = {}  # Shared servers instances, see get_server_instance()
+servers_instances_lock = threading.Lock()
+
 
 class CustomTimeout(TimeoutSauce):
     def __init__(self, *args, **kwargs):
@@ -79,81 +130,98 @@ class CustomTimeout(TimeoutSauce):
 
 
 # Set requests timeout globally, instead of specifying ``timeout=..`` kwarg on each call
+# Also applies to adapters which are not provided by the transport below (cloudscraper for ex.)
 requests.adapters.TimeoutSauce = CustomTimeout
 
 
-class HeadlessBrowser(Gtk.Window):
-    lock = False
+class TransportStats:
+    """Counters of requests sent and connections opened through the shared transport"""
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def reuse_rate(self):
+        """Ratio of requests which have been sent through an already opened (keep-alive) connection"""
+        if self.requests == 0:
+            return 0
+
+        return max(self.requests - self.connections, 0) / self.requests
 
-        self.__handlers_ids = []
+    def add_connection(self):
+        with self.lock:
+            self.connections += 1
 
-        self.scrolledwindow = Gtk.ScrolledWindow()
-        self.scrolledwindow.get_hscrollbar().hide()
-        self.scrolledwindow.get_vscrollbar().hide()
+    def add_request(self):
+        with self.lock:
+            self.requests += 1
 
-        self.viewport = Gtk.Viewport()
-        self.scrolledwindow.add(self.viewport)
-        self.add(self.scrolledwindow)
+    def reset(self):
+        self.connections = 0
+        self.requests = 0
 
-        self.webview = WebKit2.WebView()
-        self.viewport.add(self.webview)
 
-        self.settings = self.webview.get_settings()
-        self.settings.set_enable_dns_prefetching(True)
-        self.settings.set_enable_page_cache(False)
+transport_stats = TransportStats()
 
-        self.web_context = self.webview.get_context()
-        self.web_context.set_cache_model(WebKit2.CacheModel.DOCUMENT_VIEWER)
-        self.web_context.set_tls_errors_policy(WebKit2.TLSErrorsPolicy.IGNORE)
 
-        # Make window almost invisible
-        self.set_decorated(False)
-        self.set_focus_on_map(False)
-        self.set_keep_below(True)
-        self.resize(1, 1)
+class TransportHTTPConnectionPool(HTTPConnectionPool):
+    def _new_conn(self):
+        transport_stats.add_connection()
+        return super()._new_conn()
 
-    def close(self, blank=True):
-        logger.debug('WebKit2 | Closed')
 
-        self.disconnect_all_signals()
+class TransportHTTPSConnectionPool(HTTPSConnectionPool):
+    def _new_conn(self):
+        transport_stats.add_connection()
+        return super()._new_conn()
 
-        if blank:
-            GLib.idle_add(self.webview.load_uri, 'about:blank')
-        self.hide()
 
-        self.lock = False
+class TransportPoolManager(PoolManager):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
 
-    def connect_signal(self, *args):
-        handler_id = self.webview.connect(*args)
-        self.__handlers_ids.append(handler_id)
+        self.pool_classes_by_scheme = dict(
+            http=TransportHTTPConnectionPool,
+            https=TransportHTTPSConnectionPool,
+        )
 
-    def disconnect_all_signals(self):
-        for handler_id in self.__handlers_ids:
-            self.webview.disconnect(handler_id)
 
-        self.__handlers_ids = []
+class TransportAdapter(HTTPAdapter):
+    """HTTP adapter of servers sessions
 
-    def open(self, uri, user_agent=None, settings=None):
-        if self.lock:
-            return False
+    Default adapter is shared: connections pools are shared by all sessions mounting it, so keep-alive connections are reused
+    by explorer, updater and downloader whatever the session in use.
+    Servers which need another pool size or retry policy get their own adapter, see create_session().
+    """
 
-        self.settings.set_user_agent(user_agent or USER_AGENT)
-        self.settings.set_auto_load_images(True if not settings or settings.get('auto_load_images', True) else False)
+    def __init__(self, pool_maxsize=REQUESTS_POOL_MAXSIZE, retry=None):
+        if retry is None:
+            retry = Retry(
+                total=3,
+                read=0,  # Requests which may have been processed by server are not retried
+                backoff_factor=0.5,
+                status_forcelist=Retry.RETRY_AFTER_STATUS_CODES,
+                respect_retry_after_header=False,
+                raise_on_status=False,
+            )
 
-        self.lock = True
+        super().__init__(pool_connections=REQUESTS_POOL_CONNECTIONS, pool_maxsize=pool_maxsize, max_retries=retry)
 
-        logger.debug('WebKit2 | Load page %s' % uri)
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        self._pool_connections = connections
+        self._pool_maxsize = maxsize
+        self._pool_block = block
 
-        self.show_all()
-        GLib.idle_add(self.webview.load_uri, uri)
+        self.poolmanager = TransportPoolManager(num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs)
 
-        return True
+    def send(self, *args, **kwargs):
+        transport_stats.add_request()
+
+        return super().send(*args, **kwargs)
 
 
-headless_browser = HeadlessBrowser()
+transport_adapter = TransportAdapter()
 
 
 class Server:
@@ -211,7 +279,7 @@ class Server:
             if self.load_session():
                 self.logged_in = True
             else:
-                self.session = requests.Session()
+                self.session = create_session()
                 if self.headers:
                     self.session.headers = self.headers
 
@@ -288,7 +356,8 @@ class Server:
         if not mime_type.startswith('image'):
             return None
 
-        if mime_type == 'image/webp':
+        if mime_type not in get_pixbuf_mime_types():
+            # Cover can't be loaded by GdkPixbuf (WebP loader is not always installed)
             buffer = convert_image(buffer, ret_type='bytes')
 
         return buffer
@@ -303,6 +372,9 @@ class Server:
         with open(file_path, 'rb') as f:
             session = pickle.load(f)
 
+        # Pickled sessions come with their own adapters, use the shared transport instead
+        mount_transport(session)
+
         # Check session validity
         if self.session_expiration_cookies:
             # One or more cookies for which the expiration date must be checked are defined
@@ -354,16 +426,130 @@ class Server:
         return NotImplemented
 
 
+class ResponseCache:
+    """In-memory and on-disk cache of servers responses
+
+    Entries are keyed by server, method and arguments and expire after a TTL.
+    Number of entries is bounded, least recently used ones are evicted first.
+    """
+
+    def __init__(self, name, maxsize=200):
+        self.name = name
+        self.maxsize = maxsize
+
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @property
+    def dir(self):
+        dir = os.path.join(get_cache_dir(), 'responses', self.name)
+        if not os.path.exists(dir):
+            os.makedirs(dir)
+
+        return dir
+
+    @staticmethod
+    def get_key(server, method, *args, **kwargs):
+        data = repr((server.id, method, args, sorted(kwargs.items())))
+
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def _evict(self):
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def call(self, ttl, server, method, *args, **kwargs):
+        """Returns cached response of `server.method(*args, **kwargs)` or calls it and caches its response
+
+        Only non empty responses are cached.
+
+        :param ttl: time to live of response in seconds
+        """
+        key = self.get_key(server, method, *args, **kwargs)
+
+        if (response := self.get(key)) is not None:
+            return response
+
+        response = getattr(server, method)(*args, **kwargs)
+        if response:
+            self.set(key, response, ttl)
+
+        return response
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+            for name in os.listdir(self.dir):
+                os.unlink(os.path.join(self.dir, name))
+
+    def get(self, key):
+        now = time.time()
+
+        with self.lock:
+            if key in self.entries:
+                expires, response = self.entries[key]
+                if expires > now:
+                    self.entries.move_to_end(key)
+                    return deepcopy(response)
+
+                del self.entries[key]
+
+            path = os.path.join(self.dir, key)
+            if not os.path.exists(path):
+                return None
+
+            try:
+                with open(path, 'rb') as fp:
+                    expires, response = pickle.load(fp)
+            except Exception:
+                expires = 0
+
+            if expires <= now:
+                os.unlink(path)
+                return None
+
+            self.entries[key] = (expires, response)
+            self._evict()
+
+        return deepcopy(response)
+
+    def set(self, key, response, ttl):
+        expires = time.time() + ttl
+        response = deepcopy(response)
+
+        with self.lock:
+            self.entries[key] = (expires, response)
+            self.entries.move_to_end(key)
+            self._evict()
+
+            try:
+                with open(os.path.join(self.dir, key), 'wb') as fp:
+                    pickle.dump((expires, response), fp)
+            except Exception as e:
+                logger.warning('Failed to save response in cache: %s', e)
+                return
+
+            # Remove least recently saved files
+            paths = [os.path.join(self.dir, name) for name in os.listdir(self.dir)]
+            if len(paths) > self.maxsize:
+                paths.sort(key=os.path.getmtime)
+                for path in paths[:len(paths) - self.maxsize]:
+                    os.unlink(path)
+
+
 def convert_date_string(date, format=None):
-    if format is not None:
-        try:
-            d = datetime.datetime.strptime(date, format)
-        except Exception:
-            d = dateparser.parse(date)
-    else:
-        d = dateparser.parse(date)
+    """Converts a date string into a date
+
+    Relative English dates ('2 days ago', 'yesterday',...) are resolved without dateparser.
+    Other dates are parsed with `format` first, then with the common DATE_FORMATS (results are memoized).
+    dateparser is only used as last resort.
+    """
+    d = parse_relative_date_string(date)
+    if d is not None:
+        return d
 
-    return d.date()
+    return parse_date_string(date, format).date()
 
 
 # https://github.com/italomaia/mangarock.py/blob/master/mangarock/mri_to_webp.py
@@ -395,10 +581,7 @@ def convert_mri_data_to_webp_buffer(data):
         56,  # 8
     ]
 
-    for bit in data:
-        buffer.append(101 ^ bit)
-
-    return bytes(buffer)
+    return bytes(buffer) + xor_buffer(data, 101)
 
 
 def convert_image(image, format='jpeg', ret_type='image'):
@@ -419,6 +602,23 @@ def convert_image(image, format='jpeg', ret_type='image'):
     return Image.open(io_buffer)
 
 
+def create_session(pool_maxsize=None, retry=None):
+    """Returns a new requests session which uses the shared transport
+
+    :param pool_maxsize: number of connections kept alive per host (default is REQUESTS_POOL_MAXSIZE)
+    :param retry: urllib3 Retry configuration (default retries connection errors and 413, 429, 503 statuses 3 times)
+
+    If one of them is given, session uses its own transport adapter: its connections pools are not shared.
+    """
+    session = requests.Session()
+    if pool_maxsize is not None or retry is not None:
+        mount_transport(session, TransportAdapter(pool_maxsize or REQUESTS_POOL_MAXSIZE, retry))
+    else:
+        mount_transport(session)
+
+    return session
+
+
 def do_login(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -476,6 +676,19 @@ def get_file_mime_type(path):
         return ''
 
 
+@lru_cache(maxsize=None)
+def get_html_parser():
+    """Returns the fastest BeautifulSoup tree builder available: lxml if it's installed, html.parser otherwise"""
+    return 'lxml' if importlib.util.find_spec('lxml') is not None else 'html.parser'
+
+
+def get_server_class(server_data):
+    """Returns the class of a server from its descriptor, its module is imported on demand"""
+    module = importlib.import_module(server_data['module_name'])
+
+    return getattr(module, server_data['class_name'])
+
+
 def get_server_class_name_by_id(id):
     """Returns server class name
 
@@ -496,6 +709,14 @@ def get_server_class_name_by_id(id):
     return id.split(':')[0].capitalize()
 
 
+def get_server_data(id):
+    """Returns the descriptor (metadata: name, lang, logo path,...) of a server from manifest, None if server is unknown
+
+    Server module is not imported.
+    """
+    return get_servers_manifest_by_id().get(id)
+
+
 def get_server_dir_name_by_id(id):
     name = id.split(':')[0]
     # Remove _whatever
@@ -504,6 +725,30 @@ def get_server_dir_name_by_id(id):
     return name
 
 
+def get_server_instance(id):
+    """Returns the shared instance of a server
+
+    Servers are instantiated only once per process (on first call): constructors can be costly (sessions, login,...).
+    """
+    with servers_instances_lock:
+        server = servers_instances.get(id)
+    if server is not None:
+        return server
+
+    if server_data := get_server_data(id):
+        server_class = get_server_class(server_data)
+    else:
+        # Server not listed in manifest
+        module = importlib.import_module('.' + get_server_module_name_by_id(id), package='komikku.servers')
+        server_class = getattr(module, get_server_class_name_by_id(id))
+
+    # Instantiated outside of lock, constructor can be slow (login)
+    server = server_class()
+
+    with servers_instances_lock:
+        return servers_instances.setdefault(id, server)
+
+
 def get_server_main_id_by_id(id):
     return id.split(':')[0].split('_')[0]
 
@@ -512,8 +757,26 @@ def get_server_module_name_by_id(id):
     return id.split(':')[-1].split('_')[0]
 
 
-@lru_cache(maxsize=None)
 def get_servers_list(include_disabled=False, order_by=('lang', 'name')):
+    """Returns servers descriptors (dicts), servers modules are not imported
+
+    Use get_server_class() to obtain the class of a server.
+    """
+    servers = [
+        server_data for server_data in get_servers_manifest()
+        if include_disabled or server_data['status'] != 'disabled'
+    ]
+
+    return sorted(servers, key=itemgetter(*order_by))
+
+
+@lru_cache(maxsize=None)
+def get_servers_manifest():
+    """Returns the metadata of all servers
+
+    Reading metadata requires to import all servers modules (and their dependencies), which is slow.
+    So, metadata are stored in a manifest file in cache, which is rebuilt when servers modules change.
+    """
     import komikku.servers
 
     def iter_namespace(ns_pkg):
@@ -523,19 +786,43 @@ def get_servers_list(include_disabled=False, order_by=('lang', 'name')):
         # the name.
         return pkgutil.iter_modules(ns_pkg.__path__, ns_pkg.__name__ + '.')
 
+    modules_infos = list(iter_namespace(komikku.servers))
+
+    # Signature of servers modules: paths, sizes and modification times of their files
+    signature = hashlib.sha1(str(VERSION).encode())
+    for finder, name, ispkg in modules_infos:
+        short_name = name.split('.')[-1]
+        path = os.path.join(finder.path, short_name, '__init__.py') if ispkg else os.path.join(finder.path, short_name + '.py')
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signature.update(f'{path}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    signature = signature.hexdigest()
+
+    manifest_path = os.path.join(get_cache_dir(), 'servers.json')
+    if os.path.exists(manifest_path):
+        try:
+            with open(manifest_path, 'r') as fp:
+                manifest = json.load(fp)
+        except Exception:
+            manifest = None
+
+        if manifest and manifest.get('signature') == signature:
+            return manifest['servers']
+
     servers = []
-    for _finder, name, _ispkg in iter_namespace(komikku.servers):
+    for _finder, name, _ispkg in modules_infos:
         module = importlib.import_module(name)
         for _name, obj in dict(inspect.getmembers(module)).items():
+            if not inspect.isclass(obj):
+                continue
             if not hasattr(obj, 'id') or not hasattr(obj, 'name') or not hasattr(obj, 'lang'):
                 continue
             if NotImplemented in (obj.id, obj.name, obj.lang):
                 continue
 
-            if not include_disabled and obj.status == 'disabled':
-                continue
-
-            if inspect.isclass(obj) and obj.__module__.startswith('komikku.servers.'):
+            if obj.__module__.startswith('komikku.servers.'):
                 logo_path = os.path.join(os.path.dirname(os.path.abspath(module.__file__)), get_server_main_id_by_id(obj.id) + '.ico')
 
                 servers.append(dict(
@@ -544,20 +831,230 @@ def get_servers_list(include_disabled=False, order_by=('lang', 'name')):
                     lang=obj.lang,
                     has_login=obj.has_login,
                     is_nsfw=obj.is_nsfw,
+                    status=obj.status,
                     class_name=get_server_class_name_by_id(obj.id),
                     logo_path=logo_path if os.path.exists(logo_path) else None,
-                    module=module,
+                    module_name=name,
                 ))
 
-    return sorted(servers, key=itemgetter(*order_by))
+    try:
+        with open(manifest_path + '.tmp', 'w') as fp:
+            json.dump(dict(signature=signature, servers=servers), fp)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    except OSError as e:
+        logger.warning(f'Failed to save servers manifest: {e}')
+
+    return servers
+
+
+@lru_cache(maxsize=None)
+def get_servers_manifest_by_id():
+    return {server_data['id']: server_data for server_data in get_servers_manifest()}
 
 
 def get_soup_element_inner_text(outer):
     return ''.join([el for el in outer if isinstance(el, NavigableString)]).strip()
 
 
+def get_transport_stats():
+    """Returns number of requests sent, connections opened and connections reuse rate of the shared transport"""
+    return dict(
+        requests=transport_stats.requests,
+        connections=transport_stats.connections,
+        reuse_rate=transport_stats.reuse_rate,
+    )
+
+
+def get_unscramble_bands_moves(length, method, size):
+    """Returns moves of bands of pixels along an axis: a list of (source start, size, destination start)
+
+    :param length: image width (columns) or height (rows)
+    :param method: scramble method, only `swap` (bands are swapped 2 by 2, last pair is kept if incomplete)
+    :param size: size of bands in pixels
+    """
+    moves = []
+
+    if method == 'swap':
+        for start in range(0, length, size * 2):
+            if start + size * 2 <= length:
+                moves.append((start, size, start + size))
+                moves.append((start + size, size, start))
+            else:
+                moves.append((start, length - start, start))
+    else:
+        raise ValueError(f'Unknown scramble method: {method}')
+
+    return moves
+
+
+@lru_cache(maxsize=64)
+def get_unscramble_index(length, method, size):
+    """Returns index of source pixels for each destination pixel along an axis (a NumPy array)"""
+    index = numpy.empty(length, dtype=numpy.intp)
+    for src, band_size, dst in get_unscramble_bands_moves(length, method, size):
+        index[dst:dst + band_size] = numpy.arange(src, src + band_size)
+
+    return index
+
+
+def mount_transport(session, adapter=None):
+    if adapter is None:
+        adapter = transport_adapter
+
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+
+@lru_cache(maxsize=4096)
+def parse_absolute_date_string(date, format=None):
+    """Parses an absolute date string with `format` first, then with the common DATE_FORMATS (memoized)
+
+    Returns None if no format matches.
+    """
+    formats = [format] if format is not None else []
+    formats += [format_ for format_ in DATE_FORMATS if format_ != format]
+
+    for format_ in formats:
+        try:
+            return datetime.datetime.strptime(date, format_)
+        except (TypeError, ValueError):
+            continue
+
+    return None
+
+
+def parse_date_string(date, format=None):
+    """Parses a date string into a datetime
+
+    dateparser is only used as last resort. Its results are not memoized: they can be relative dates ('hier', 'il y a 2 jours',...).
+    """
+    d = parse_absolute_date_string(date, format)
+    if d is not None:
+        return d
+
+    # Slow path: dateparser loads languages data at first use, import it only when needed
+    import dateparser
+
+    return dateparser.parse(date)
+
+
+def parse_relative_date_string(date):
+    """Parses relative English date strings ('today', 'yesterday', '3 days ago', 'a month ago',...)
+
+    Returns None if `date` is not a relative date.
+    """
+    if not isinstance(date, str):
+        return None
+
+    date = date.strip().lower()
+    today = datetime.date.today()
+
+    if date in ('just now', 'today'):
+        return today
+    if date == 'yesterday':
+        return today - datetime.timedelta(days=1)
+
+    match = DATE_RELATIVE_RE.match(date)
+    if match is None:
+        return None
+
+    count = match.group('count')
+    count = int(count) if count.isdigit() else 1
+    unit = match.group('unit')
+
+    if unit in DATE_RELATIVE_UNITS:
+        return (datetime.datetime.now() - datetime.timedelta(**{DATE_RELATIVE_UNITS[unit]: count})).date()
+
+    months = count * 12 if unit == 'year' else count
+    year, month = divmod(today.year * 12 + today.month - 1 - months, 12)
+    month += 1
+    # Clamp day to the last day of target month
+    day = min(today.day, (datetime.date(year + month // 12, month % 12 + 1, 1) - datetime.timedelta(days=1)).day)
+
+    return datetime.date(year, month, day)
+
+
+def parse_html(markup):
+    """Parses an HTML document with lxml (falls back to html.parser if lxml is not installed)
+
+    Opt-in per server: tree builders don't build the same tree from invalid markup, a server parser
+    must be checked against lxml trees before it uses this helper instead of BeautifulSoup(markup, 'html.parser').
+    """
+    return BeautifulSoup(markup, get_html_parser())
+
+
+def remove_server_instances(main_id):
+    """Removes shared instances of a server (all languages), they will be recreated on next get_server_instance() call
+
+    Used when server credentials change.
+    """
+    with servers_instances_lock:
+        for id in [id for id in servers_instances if get_server_main_id_by_id(id) == main_id]:
+            del servers_instances[id]
+
+
+def save_page_image(buffer, mime_type, path, scrambled=False):
+    """Saves a chapter page image on disk
+
+    Image is stored as is when GdkPixbuf can load it. Otherwise (or if image must be unscrambled),
+    it's decoded and encoded only once, directly to file: JPEG when it can't be loaded, original format otherwise.
+    If it can't be decoded, it's stored as is (as before transcoding was introduced).
+    File name is kept unchanged, GdkPixbuf detects format from content.
+    Image is written in a temporary (hidden) file first: a page file is never visible partially written.
+
+    :param buffer: image content (bytes)
+    :param mime_type: image MIME type
+    :param path: destination file path
+    :param scrambled: whether image must be unscrambled
+    :return: dict with size in bytes of the saved file, width and height of image (read from header when stored as is)
+    """
+    start_time = time.thread_time()
+
+    tmp_path = os.path.join(os.path.dirname(path), f'.{os.path.basename(path)}.part')
+
+    transcoded = False
+    supported = mime_type in get_pixbuf_mime_types()
+    if not supported or scrambled:
+        try:
+            image = Image.open(io.BytesIO(buffer))
+            format = image.format if supported else 'JPEG'
+
+            if scrambled:
+                image = unscramble_image(image)
+            elif format == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+
+            image.save(tmp_path, format)
+            transcoded = True
+            width, height = image.size
+        except Exception as e:
+            logger.info(f'Failed to transcode page image {os.path.basename(path)}, stored as is: {e}')
+
+    if not transcoded:
+        with open(tmp_path, 'wb') as fp:
+            fp.write(buffer)
+
+        try:
+            # Only image header is read
+            width, height = Image.open(io.BytesIO(buffer)).size
+        except Exception:
+            width = height = None
+
+    os.replace(tmp_path, path)
+    size = os.path.getsize(path)
+
+    logger.debug('Page {0} saved: {1} bytes, {2} ({3:.3f}s CPU)'.format(
+        os.path.basename(path), size, 'transcoded' if transcoded else 'stored as is', time.thread_time() - start_time))
+
+    return dict(
+        size=size,
+        width=width,
+        height=height,
+    )
+
+
 def search_duckduckgo(site, term):
-    session = requests.Session()
+    session = create_session()
     session.headers.update({'user-agent': USER_AGENT})
 
     params = dict(
@@ -582,40 +1079,120 @@ def search_duckduckgo(site, term):
     return results
 
 
+def split_page_image(path, segment_height):
+    """Splits a (long-strip) chapter page image into segments of fixed height
+
+    Segments are saved in a sub-folder of page image folder (see PAGES_SEGMENTS_DIR_NAME), losslessly to avoid
+    a second lossy encoding: PNG (JPEG and PNG images) or lossless WebP (WebP images).
+    Original image is kept: segments are only used by readers which can work with them (Webtoon pager).
+    Disk usage of a split page is therefore much higher: up to 3 to 5 times the original size for a JPEG image.
+
+    :param path: page image file path
+    :param segment_height: height in pixels of segments (last one can be smaller)
+    :return: list of segments (image name relative to page image folder, height and size in bytes) or None if image can't be split
+    """
+    start_time = time.thread_time()
+
+    try:
+        image = Image.open(path)
+        if getattr(image, 'is_animated', False) or image.format not in ('JPEG', 'PNG', 'WEBP'):
+            return None
+
+        width, height = image.size
+        image.load()
+    except Exception as e:
+        logger.info(f'Failed to split page image {path}: {e}')
+        return None
+
+    if image.format == 'WEBP':
+        format, ext, options = 'WEBP', '.webp', dict(lossless=True)
+    else:
+        format, ext, options = 'PNG', '.png', {}
+        if image.mode == 'CMYK':
+            image = image.convert('RGB')
+
+    folder = os.path.join(os.path.dirname(path), PAGES_SEGMENTS_DIR_NAME)
+    os.makedirs(folder, exist_ok=True)
+
+    name = os.path.splitext(os.path.basename(path))[0]
+
+    segments = []
+    for index, top in enumerate(range(0, height, segment_height)):
+        bottom = min(top + segment_height, height)
+        segment_name = os.path.join(PAGES_SEGMENTS_DIR_NAME, f'{name}-{index + 1:03d}{ext}')
+
+        segment_path = os.path.join(os.path.dirname(path), segment_name)
+        image.crop((0, top, width, bottom)).save(segment_path, format, **options)
+
+        segments.append(dict(
+            image=segment_name,
+            height=bottom - top,
+            size=os.path.getsize(segment_path),
+        ))
+
+    logger.debug('Page {0} split in {1} segments ({2:.3f}s CPU)'.format(
+        os.path.basename(path), len(segments), time.thread_time() - start_time))
+
+    return segments
+
+
 # https://github.com/Harkame/JapScanDownloader
-def unscramble_image(image):
+def unscramble_image(image, scheme='default'):
     """Unscramble an image
 
+    The permutation of pixels described by the scheme (see SCRAMBLE_SCHEMES) is computed once per image size.
+    With NumPy, it's applied as a single reindex of the decoded pixels buffer, otherwise bands are moved with PIL.
+
     :param image: PIL.Image.Image or bytes object
+    :param scheme: name of the scramble scheme
     """
     if not isinstance(image, Image.Image):
         image = Image.open(io.BytesIO(image))
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    columns_method, columns_size = SCRAMBLE_SCHEMES[scheme]['columns']
+    rows_method, rows_size = SCRAMBLE_SCHEMES[scheme]['rows']
+
+    if numpy is not None:
+        columns_index = get_unscramble_index(image.width, columns_method, columns_size)
+        rows_index = get_unscramble_index(image.height, rows_method, rows_size)
+
+        return Image.fromarray(numpy.asarray(image)[numpy.ix_(rows_index, columns_index)])
 
     temp = Image.new('RGB', image.size)
+    for src, size, dst in get_unscramble_bands_moves(image.width, columns_method, columns_size):
+        temp.paste(image.crop((src, 0, src + size, image.height)), (dst, 0))
+
     output_image = Image.new('RGB', image.size)
+    for src, size, dst in get_unscramble_bands_moves(image.height, rows_method, rows_size):
+        output_image.paste(temp.crop((0, src, image.width, src + size)), (0, dst))
 
-    for x in range(0, image.width, 200):
-        col1 = image.crop((x, 0, x + 100, image.height))
+    return output_image
 
-        if x + 200 <= image.width:
-            col2 = image.crop((x + 100, 0, x + 200, image.height))
-            temp.paste(col1, (x + 100, 0))
-            temp.paste(col2, (x, 0))
-        else:
-            col2 = image.crop((x + 100, 0, image.width, image.height))
-            temp.paste(col1, (x, 0))
-            temp.paste(col2, (x + 100, 0))
 
-    for y in range(0, temp.height, 200):
-        row1 = temp.crop((0, y, temp.width, y + 100))
+def xor_buffer(buffer, key):
+    """XORs a buffer with a repeated key (used by servers which obfuscate images)
 
-        if y + 200 <= temp.height:
-            row2 = temp.crop((0, y + 100, temp.width, y + 200))
-            output_image.paste(row1, (0, y + 100))
-            output_image.paste(row2, (0, y))
-        else:
-            row2 = temp.crop((0, y + 100, temp.width, temp.height))
-            output_image.paste(row1, (0, y))
-            output_image.paste(row2, (0, y + 100))
+    Whole buffer is processed at once (translation table for a single byte key, big integers otherwise),
+    which is orders of magnitude faster than a per-byte loop in Python.
 
-    return output_image
+    :param buffer: bytes-like object
+    :param key: an int (single byte key) or a bytes-like object/list of ints
+    :return: bytes
+    """
+    if isinstance(key, int):
+        key = bytes([key])
+    else:
+        key = bytes(key)
+
+    size = len(buffer)
+    if size == 0 or not key:
+        return bytes(buffer)
+
+    if len(key) == 1:
+        return bytes(buffer).translate(bytes(i ^ key[0] for i in range(256)))
+
+    key_stream = (key * (size // len(key) + 1))[:size]
+
+    return (int.from_bytes(buffer, 'big') ^ int.from_bytes(key_stream, 'big')).to_bytes(size, 'big')
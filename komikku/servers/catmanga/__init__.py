@@ -8,9 +8,9 @@ from bs4 import BeautifulSoup
 from datetime import datetime
 import json
 import re
-import requests
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
@@ -29,7 +29,7 @@ class Catmanga(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers.update({'user-agent': USER_AGENT})
 
     def get_manga_data(self, initial_data):
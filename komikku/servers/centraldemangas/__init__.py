@@ -7,10 +7,10 @@
 from collections import OrderedDict
 from bs4 import BeautifulSoup
 import logging
-import requests
 import unidecode
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
@@ -38,7 +38,7 @@ class Centraldemangas(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers = headers
 
     def get_manga_data(self, initial_data):
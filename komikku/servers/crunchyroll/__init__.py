@@ -5,6 +5,7 @@ from komikku.servers import do_login
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
+from komikku.servers import xor_buffer
 
 SERVER_NAME = 'Crunchyroll'
 
@@ -71,7 +72,7 @@ class Crunchyroll(Server):
     @staticmethod
     def decode_image(buffer):
         # Don't know why 66 is special
-        return bytes(b ^ 66 for b in buffer)
+        return xor_buffer(buffer, 66)
 
     @do_login
     def get_manga_data(self, initial_data):
@@ -5,8 +5,8 @@
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
 from bs4 import BeautifulSoup
-import requests
 
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
@@ -28,7 +28,7 @@ class Dbmultiverse(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers.update({'user-agent': USER_AGENT})
 
     def get_manga_data(self, initial_data):
@@ -5,8 +5,8 @@
 # Author: GrownNed <grownned@gmail.com>
 
 from datetime import datetime
-import requests
 
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
@@ -33,7 +33,7 @@ class Desu(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers = headers
 
     def get_manga_data(self, initial_data):
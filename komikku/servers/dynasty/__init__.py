@@ -4,14 +4,14 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: Liliana Prikler <liliana.prikler@gmail.com>
 
-from bs4 import BeautifulSoup
 from gettext import gettext as _
 import json
 import logging
-import requests
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
+from komikku.servers import parse_html
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
 from komikku.utils import skip_past
@@ -63,7 +63,7 @@ class Dynasty(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers.update({'user-agent': USER_AGENT})
 
     @classmethod
@@ -90,7 +90,7 @@ class Dynasty(Server):
         if r.status_code != 200 or mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         data = initial_data.copy()
         data.update(dict(
@@ -220,7 +220,7 @@ class Dynasty(Server):
         if r.status_code != 200 or mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         pages = None
         for script_element in soup.find_all('script'):
@@ -311,7 +311,7 @@ class Dynasty(Server):
         if r.status_code == 200:
             try:
                 results = []
-                soup = BeautifulSoup(r.text, 'lxml')
+                soup = parse_html(r.text)
                 elements = soup.find('dl', class_='chapter-list').find_all('dd')
 
                 for element in elements:
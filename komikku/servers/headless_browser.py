@@ -0,0 +1,255 @@
+# Copyright (C) 2019-2021 Valéry Febvre
+# SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
+# Author: Valéry Febvre <vfebvre@easter-eggs.com>
+
+from collections import deque
+from concurrent.futures import Future
+import gi
+import logging
+import threading
+import time
+
+gi.require_version('Gtk', '3.0')
+gi.require_version('WebKit2', '4.0')
+
+from gi.repository import GLib
+from gi.repository import Gtk
+from gi.repository import WebKit2
+
+from komikku.servers import USER_AGENT
+
+HEADLESS_BROWSERS_POOL_SIZE = 3
+HEADLESS_BROWSER_JOB_TIMEOUT = 60  # in seconds
+
+logger = logging.getLogger('komikku.servers.headless_browser')
+
+
+class HeadlessBrowser(Gtk.Window):
+    lock = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        self.__handlers_ids = []
+
+        self.scrolledwindow = Gtk.ScrolledWindow()
+        self.scrolledwindow.get_hscrollbar().hide()
+        self.scrolledwindow.get_vscrollbar().hide()
+
+        self.viewport = Gtk.Viewport()
+        self.scrolledwindow.add(self.viewport)
+        self.add(self.scrolledwindow)
+
+        self.webview = WebKit2.WebView()
+        self.viewport.add(self.webview)
+
+        self.settings = self.webview.get_settings()
+        self.settings.set_enable_dns_prefetching(True)
+        self.settings.set_enable_page_cache(False)
+
+        self.web_context = self.webview.get_context()
+        self.web_context.set_cache_model(WebKit2.CacheModel.DOCUMENT_VIEWER)
+        self.web_context.set_tls_errors_policy(WebKit2.TLSErrorsPolicy.IGNORE)
+
+        # Make window almost invisible
+        self.set_decorated(False)
+        self.set_focus_on_map(False)
+        self.set_keep_below(True)
+        self.resize(1, 1)
+
+    def close(self, blank=True):
+        logger.debug('WebKit2 | Closed')
+
+        self.disconnect_all_signals()
+
+        if blank:
+            GLib.idle_add(self.webview.load_uri, 'about:blank')
+        self.hide()
+
+        self.lock = False
+
+    def connect_signal(self, *args):
+        handler_id = self.webview.connect(*args)
+        self.__handlers_ids.append(handler_id)
+
+    def disconnect_all_signals(self):
+        for handler_id in self.__handlers_ids:
+            self.webview.disconnect(handler_id)
+
+        self.__handlers_ids = []
+
+    def open(self, uri, user_agent=None, settings=None):
+        if self.lock:
+            return False
+
+        self.settings.set_user_agent(user_agent or USER_AGENT)
+        self.settings.set_auto_load_images(True if not settings or settings.get('auto_load_images', True) else False)
+
+        self.lock = True
+
+        logger.debug('WebKit2 | Load page %s' % uri)
+
+        self.show_all()
+        GLib.idle_add(self.webview.load_uri, uri)
+
+        return True
+
+
+class HeadlessBrowserError(Exception):
+    pass
+
+
+class HeadlessBrowserJob:
+    """A page to load in a headless browser of the pool
+
+    `setup` is called in main thread with the browser and the job once page loading has started.
+    It must connect the needed signals (with `browser.connect_signal`) and, in the end, call `job.resolve(result)`
+    or `job.reject(message)` which releases the browser.
+    """
+
+    def __init__(self, pool, uri, setup, user_agent, settings, timeout):
+        self.pool = pool
+        self.uri = uri
+        self.setup = setup
+        self.user_agent = user_agent
+        self.settings = settings
+        self.timeout = timeout
+
+        self.browser = None
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+        self.timeout_source_id = None
+
+    def reject(self, message):
+        self.__finish(error=HeadlessBrowserError(message))
+
+    def resolve(self, result=None):
+        self.__finish(result=result)
+
+    def __finish(self, result=None, error=None):
+        if self.future.done():
+            return
+
+        if self.timeout_source_id is not None:
+            GLib.source_remove(self.timeout_source_id)
+            self.timeout_source_id = None
+
+        if error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(result)
+
+        self.pool.release(self)
+
+
+class HeadlessBrowsersPool:
+    """Pool of headless browsers with a FIFO queue of jobs
+
+    Browsers are created on demand (up to `size`), in main thread.
+    Jobs can be submitted from any thread, the returned Future is used to wait for their results.
+    """
+
+    def __init__(self, size=HEADLESS_BROWSERS_POOL_SIZE):
+        self.size = size
+
+        self.browsers = []
+        self.idle_browsers = []
+        self.jobs = deque()
+        self.lock = threading.Lock()
+
+        self.stats = dict(
+            jobs=0,
+            errors=0,
+            timeouts=0,
+            max_queue_depth=0,
+            total_wait_time=0,
+        )
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['queue_depth'] = len(self.jobs)
+
+        stats['average_wait_time'] = round(stats['total_wait_time'] / stats['jobs'], 3) if stats['jobs'] else 0
+
+        return stats
+
+    def release(self, job):
+        """Closes the browser of a finished job and starts next queued job (main thread only)"""
+        if job.future.exception() is not None:
+            with self.lock:
+                self.stats['errors'] += 1
+
+        job.browser.close()
+        self.idle_browsers.append(job.browser)
+        job.browser = None
+
+        self.__process_queue()
+
+    def submit(self, uri, setup, user_agent=None, settings=None, timeout=HEADLESS_BROWSER_JOB_TIMEOUT):
+        """Queues a page load
+
+        :param uri: page URI
+        :param setup: function called in main thread with (browser, job) once page loading has started
+        :param user_agent: optional user agent
+        :param settings: optional dict of settings (auto_load_images)
+        :param timeout: delay in seconds after which job is rejected
+        :return: a concurrent.futures.Future
+        """
+        job = HeadlessBrowserJob(self, uri, setup, user_agent, settings, timeout)
+
+        with self.lock:
+            self.jobs.append(job)
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], len(self.jobs))
+
+        GLib.idle_add(self.__process_queue)
+
+        return job.future
+
+    def __on_timeout(self, job):
+        job.timeout_source_id = None
+
+        with self.lock:
+            self.stats['timeouts'] += 1
+
+        job.reject(f'Timeout of {job.timeout}s exceeded: {job.uri}')
+
+        return GLib.SOURCE_REMOVE
+
+    def __process_queue(self):
+        while True:
+            with self.lock:
+                if not self.jobs:
+                    break
+
+                if not self.idle_browsers:
+                    if len(self.browsers) >= self.size:
+                        break
+
+                    logger.debug('WebKit2 | Create headless browser #{0}'.format(len(self.browsers) + 1))
+                    browser = HeadlessBrowser()
+                    self.browsers.append(browser)
+                    self.idle_browsers.append(browser)
+
+                job = self.jobs.popleft()
+                browser = self.idle_browsers.pop()
+
+                wait_time = time.monotonic() - job.submitted_at
+                self.stats['jobs'] += 1
+                self.stats['total_wait_time'] += wait_time
+
+            logger.debug(f'WebKit2 | Job started after {wait_time:.3f}s in queue ({len(self.jobs)} job(s) still queued)')
+
+            job.browser = browser
+            browser.open(job.uri, user_agent=job.user_agent, settings=job.settings)
+            job.timeout_source_id = GLib.timeout_add_seconds(job.timeout, self.__on_timeout, job)
+
+            try:
+                job.setup(browser, job)
+            except Exception as e:
+                job.reject(f'Failed to setup job: {e}')
+
+        return GLib.SOURCE_REMOVE
+
+
+headless_browsers_pool = HeadlessBrowsersPool()
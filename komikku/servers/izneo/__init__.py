@@ -4,12 +4,12 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: tijder
 
-from bs4 import BeautifulSoup
 import datetime
 import json
 
 from komikku.servers import do_login
 from komikku.servers import get_buffer_mime_type
+from komikku.servers import parse_html
 from komikku.servers import Server
 
 
@@ -100,7 +100,7 @@ class Izneo(Server):
         if mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.content, 'lxml')
+        soup = parse_html(r.content)
 
         script_content = soup.find('script').string.strip()
         pages = json.loads(script_content.split('resourcesIndex               = ')[1].split(';')[0])
@@ -162,7 +162,7 @@ class Izneo(Server):
         if mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.content, 'lxml')
+        soup = parse_html(r.content)
 
         self.session_post(
             self.login_url,
@@ -4,22 +4,27 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
+import gi
 from bs4 import BeautifulSoup
 from io import BytesIO
 import json
 import logging
 import requests
-import time
+
+gi.require_version('WebKit2', '4.0')
 
 from gi.repository import GLib
 from gi.repository import WebKit2
 
-from komikku.servers import headless_browser
+from komikku.servers import create_session
 from komikku.servers import convert_date_string
 from komikku.servers import get_buffer_mime_type
+from komikku.servers import parse_html
 from komikku.servers import search_duckduckgo
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
+from komikku.servers.headless_browser import HeadlessBrowserError
+from komikku.servers.headless_browser import headless_browsers_pool
 
 logger = logging.getLogger('komikku.servers.japscan')
 
@@ -39,7 +44,7 @@ class Japscan(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers.update({'user-agent': USER_AGENT})
 
     @classmethod
@@ -168,18 +173,12 @@ class Japscan(Server):
         """
         Returns chapter page scan (image) content
         """
-        error = None
-        image_buffer = None
-
-        def load_page(url):
-            if not headless_browser.open(url):
-                return True
+        def setup(browser, job):
+            browser.connect_signal('load-changed', on_load_changed)
+            browser.connect_signal('load-failed', on_load_failed, job)
+            browser.connect_signal('notify::title', on_title_changed, job)
 
-            headless_browser.connect_signal('load-changed', on_load_changed)
-            headless_browser.connect_signal('load-failed', on_load_failed)
-            headless_browser.connect_signal('notify::title', on_title_changed)
-
-        def on_load_changed(_webview, event):
+        def on_load_changed(webview, event):
             if event != WebKit2.LoadEvent.FINISHED:
                 return
 
@@ -197,54 +196,46 @@ class Japscan(Server):
                     }
                 }, 100);
             """
-            headless_browser.webview.run_javascript(js, None, None)
-
-        def on_load_failed(_webview, _event, _uri, gerror):
-            nonlocal error
+            webview.run_javascript(js, None, None)
 
-            error = f'Failed to load page image: {page_url}'
+        def on_load_failed(_webview, _event, _uri, gerror, job):
+            job.reject(f'Failed to load page image: {page_url}')
 
-            headless_browser.close()
-
-        def on_title_changed(_webview, title):
+        def on_title_changed(webview, _title, job):
             try:
-                size = json.loads(headless_browser.webview.props.title)
+                size = json.loads(webview.props.title)
             except Exception:
                 return
 
             # Resize webview to image size
-            headless_browser.webview.set_size_request(size['width'], size['height'])
+            webview.set_size_request(size['width'], size['height'])
 
             def do_snapshot():
-                headless_browser.webview.get_snapshot(
-                    WebKit2.SnapshotRegion.FULL_DOCUMENT, WebKit2.SnapshotOptions.NONE, None, on_snapshot_finished)
-
-            def on_snapshot_finished(_webview, result):
-                nonlocal error
-                nonlocal image_buffer
+                webview.get_snapshot(
+                    WebKit2.SnapshotRegion.FULL_DOCUMENT, WebKit2.SnapshotOptions.NONE, None, on_snapshot_finished, job)
 
+            def on_snapshot_finished(webview, result, job):
                 # Get image data
-                surface = headless_browser.webview.get_snapshot_finish(result)
+                surface = webview.get_snapshot_finish(result)
                 if surface:
                     io_buffer = BytesIO()
                     surface.write_to_png(io_buffer)
-                    image_buffer = io_buffer.getbuffer()
+                    job.resolve(io_buffer.getbuffer())
                 else:
-                    error = f'Failed to do page image snapshot: {page_url}'
-
-                headless_browser.close()
+                    job.reject(f'Failed to do page image snapshot: {page_url}')
 
             GLib.timeout_add(100, do_snapshot)
 
         page_url = self.base_url + page['url']
         image_name = page_url.split('/')[-1].replace('html', 'png')
-        GLib.timeout_add(100, load_page, page_url)
 
-        while image_buffer is None and error is None:
-            time.sleep(.1)
+        # Several pages can be processed at the same time, one per headless browser of the pool
+        future = headless_browsers_pool.submit(page_url, setup)
 
-        if error:
-            logger.warning(error)
+        try:
+            image_buffer = future.result()
+        except HeadlessBrowserError as e:
+            logger.warning(e)
             raise requests.exceptions.RequestException()
 
         return dict(
@@ -272,7 +263,7 @@ class Japscan(Server):
         if r.status_code != 200 or mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         results = []
         for li_element in soup.find('div', id='top_mangas_all_time').find_all('li'):
@@ -8,12 +8,11 @@ from functools import lru_cache
 import html
 import logging
 import re
-import requests
-from requests.adapters import HTTPAdapter
 from urllib3.util import Retry
 from uuid import UUID
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
@@ -51,11 +50,9 @@ class Mangadex(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
-            self.session.headers.update({'user-agent': USER_AGENT})
-
             retry = Retry(total=5, backoff_factor=1, respect_retry_after_header=False, status_forcelist=Retry.RETRY_AFTER_STATUS_CODES)
-            self.session.mount(self.api_base_url, HTTPAdapter(max_retries=retry))
+            self.session = create_session(retry=retry)
+            self.session.headers.update({'user-agent': USER_AGENT})
 
     @staticmethod
     def get_group_name(group_id, groups_list):
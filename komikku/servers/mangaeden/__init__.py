@@ -7,9 +7,9 @@
 import json
 from collections import OrderedDict
 from bs4 import BeautifulSoup
-import requests
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
@@ -37,7 +37,7 @@ class Mangaeden(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers = headers
 
     @classmethod
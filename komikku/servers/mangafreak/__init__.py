@@ -6,18 +6,21 @@
 
 from bs4 import BeautifulSoup
 import functools
+import gi
 import logging
 import requests
-import time
 
-from gi.repository import GLib
+gi.require_version('WebKit2', '4.0')
+
 from gi.repository import WebKit2
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
-from komikku.servers import headless_browser
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
+from komikku.servers.headless_browser import HeadlessBrowserError
+from komikku.servers.headless_browser import headless_browsers_pool
 
 logger = logging.getLogger('komikku.servers.mangafreak')
 
@@ -32,31 +35,21 @@ def bypass_cloudflare(func):
             return func(*args, **kwargs)
 
         cf_reload_count = -1
-        done = False
-        error = None
-
-        def load_page():
-            settings = dict(
-                auto_load_images=False,
-            )
-            if not headless_browser.open(server.base_url, user_agent=USER_AGENT, settings=settings):
-                return True
 
-            headless_browser.connect_signal('load-changed', on_load_changed)
-            headless_browser.connect_signal('load-failed', on_load_failed)
-            headless_browser.connect_signal('notify::title', on_title_changed)
+        def setup(browser, job):
+            browser.connect_signal('load-changed', on_load_changed, job)
+            browser.connect_signal('load-failed', on_load_failed, job)
+            browser.connect_signal('notify::title', on_title_changed, job)
 
-        def on_load_changed(webview, event):
+        def on_load_changed(webview, event, job):
             nonlocal cf_reload_count
-            nonlocal error
 
             if event != WebKit2.LoadEvent.FINISHED:
                 return
 
             cf_reload_count += 1
             if cf_reload_count > 20:
-                error = 'Max Cloudflare reload exceeded'
-                headless_browser.close()
+                job.reject('Max Cloudflare reload exceeded')
                 return
 
             # Detect end of Cloudflare challenge via JavaScript
@@ -68,26 +61,20 @@ def bypass_cloudflare(func):
                     }
                 }, 100);
             """
-            headless_browser.webview.run_javascript(js, None, None)
-
-        def on_load_failed(_webview, _event, _uri, gerror):
-            nonlocal error
-
-            error = f'Failed to load homepage: {server.base_url}'
+            webview.run_javascript(js, None, None)
 
-            headless_browser.close()
+        def on_load_failed(_webview, _event, _uri, gerror, job):
+            job.reject(f'Failed to load homepage: {server.base_url}')
 
-        def on_title_changed(webview, title):
-            if headless_browser.webview.props.title != 'ready':
+        def on_title_changed(webview, title, job):
+            if webview.props.title != 'ready':
                 return
 
-            cookie_manager = headless_browser.web_context.get_cookie_manager()
-            cookie_manager.get_cookies(server.base_url, None, on_get_cookies_finish, None)
+            cookie_manager = webview.get_context().get_cookie_manager()
+            cookie_manager.get_cookies(server.base_url, None, on_get_cookies_finish, job)
 
-        def on_get_cookies_finish(cookie_manager, result, user_data):
-            nonlocal done
-
-            server.session = requests.Session()
+        def on_get_cookies_finish(cookie_manager, result, job):
+            server.session = create_session()
             server.session.headers.update({'user-agent': USER_AGENT})
 
             for cookie in cookie_manager.get_cookies_finish(result):
@@ -100,16 +87,17 @@ def bypass_cloudflare(func):
                 )
                 server.session.cookies.set_cookie(rcookie)
 
-            done = True
-            headless_browser.close()
-
-        GLib.timeout_add(100, load_page)
+            job.resolve()
 
-        while not done and error is None:
-            time.sleep(.1)
+        settings = dict(
+            auto_load_images=False,
+        )
+        future = headless_browsers_pool.submit(server.base_url, setup, user_agent=USER_AGENT, settings=settings)
 
-        if error:
-            logger.warning(error)
+        try:
+            future.result()
+        except HeadlessBrowserError as e:
+            logger.warning(e)
             raise requests.exceptions.RequestException()
 
         return func(*args, **kwargs)
@@ -4,21 +4,24 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: ISO-morphism <me@iso-morphism.name>
 
+import gi
 from bs4 import BeautifulSoup
 import json
 import logging
 import requests
-import time
 
-from gi.repository import GLib
+gi.require_version('WebKit2', '4.0')
+
 from gi.repository import WebKit2
 
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import convert_date_string
 from komikku.servers import get_soup_element_inner_text
-from komikku.servers import headless_browser
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
+from komikku.servers.headless_browser import HeadlessBrowserError
+from komikku.servers.headless_browser import headless_browsers_pool
 
 headers = {
     'User-Agent': USER_AGENT,
@@ -29,23 +32,13 @@ SERVER_NAME = 'MangaHub'
 
 
 def get_chapter_page_html(url):
-    error = None
-    html = None
-
-    def load_page():
-        settings = dict(
-            auto_load_images=False,
-        )
-        if not headless_browser.open(url, user_agent=USER_AGENT, settings=settings):
-            return True
+    def setup(browser, job):
+        browser.connect_signal('load-changed', on_load_changed)
+        browser.connect_signal('load-failed', on_load_failed, job)
+        browser.connect_signal('notify::title', on_title_changed, job)
 
-        headless_browser.connect_signal('load-changed', on_load_changed)
-        headless_browser.connect_signal('load-failed', on_load_failed)
-        headless_browser.connect_signal('notify::title', on_title_changed)
-
-    def on_get_html_finish(webview, result, user_data=None):
-        nonlocal error
-        nonlocal html
+    def on_get_html_finish(webview, result, job):
+        html = None
 
         js_result = webview.run_javascript_finish(result)
         if js_result:
@@ -54,11 +47,11 @@ def get_chapter_page_html(url):
                 html = js_value.to_string()
 
         if html is None:
-            error = f'Failed to get chapter page html: {url}'
-
-        headless_browser.close()
+            job.reject(f'Failed to get chapter page html: {url}')
+        else:
+            job.resolve(html)
 
-    def on_load_changed(_webview, event):
+    def on_load_changed(webview, event):
         if event != WebKit2.LoadEvent.FINISHED:
             return
 
@@ -73,31 +66,27 @@ def get_chapter_page_html(url):
             }, 100);
         """
 
-        headless_browser.webview.run_javascript(js, None, None, None)
-
-    def on_load_failed(_webview, _event, _uri, gerror):
-        nonlocal error
-
-        error = f'Failed to load chapter page: {url}'
+        webview.run_javascript(js, None, None, None)
 
-        headless_browser.close()
+    def on_load_failed(_webview, _event, _uri, gerror, job):
+        job.reject(f'Failed to load chapter page: {url}')
 
-    def on_title_changed(_webview, _title):
-        if headless_browser.webview.props.title == 'ready':
+    def on_title_changed(webview, _title, job):
+        if webview.props.title == 'ready':
             # All images have been inserted in DOM, we can retrieve page HTML
-            headless_browser.webview.run_javascript('document.documentElement.outerHTML', None, on_get_html_finish, None)
+            webview.run_javascript('document.documentElement.outerHTML', None, on_get_html_finish, job)
 
-    GLib.timeout_add(100, load_page)
+    settings = dict(
+        auto_load_images=False,
+    )
+    future = headless_browsers_pool.submit(url, setup, user_agent=USER_AGENT, settings=settings)
 
-    while html is None and error is None:
-        time.sleep(.1)
-
-    if error:
-        logger.warning(error)
+    try:
+        return future.result()
+    except HeadlessBrowserError as e:
+        logger.warning(e)
         raise requests.exceptions.RequestException()
 
-    return html
-
 
 class Mangahub(Server):
     id = 'mangahub'
@@ -114,7 +103,7 @@ class Mangahub(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers = headers
 
     def get_manga_data(self, initial_data):
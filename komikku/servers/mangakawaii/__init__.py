@@ -11,6 +11,7 @@ import re
 
 from komikku.servers import convert_date_string
 from komikku.servers import get_buffer_mime_type
+from komikku.servers import parse_html
 from komikku.servers import Server
 from komikku.servers import USER_AGENT_MOBILE
 
@@ -227,7 +228,7 @@ class Mangakawaii(Server):
         if mime_type != 'text/plain':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         results = []
         for element in soup.find_all('div', class_='media-thumbnail'):
@@ -4,12 +4,12 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: GrownNed <grownned@gmail.com>
 
-from bs4 import BeautifulSoup
-import requests
 import json
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
+from komikku.servers import parse_html
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
 
@@ -32,7 +32,7 @@ class Mangalib(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers = headers
 
     def get_manga_data(self, initial_data):
@@ -51,7 +51,7 @@ class Mangalib(Server):
         if r.status_code != 200 or mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         data = initial_data.copy()
         data.update(dict(
@@ -135,7 +135,7 @@ class Mangalib(Server):
         if r.status_code != 200 or mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         for script_element in soup.find_all('script'):
             script = script_element.string
@@ -197,7 +197,7 @@ class Mangalib(Server):
         if r.status_code != 200 or mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         results = []
         for card in soup.find_all('a', class_='media-card'):
@@ -218,7 +218,7 @@ class Mangalib(Server):
         if r.status_code != 200 or mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         results = []
         for card in soup.find_all('a', class_='media-card'):
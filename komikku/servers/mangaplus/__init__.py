@@ -7,7 +7,6 @@
 from dataclasses import dataclass
 from datetime import datetime
 from enum import IntEnum
-import requests
 import re
 from typing import List
 import uuid
@@ -16,9 +15,11 @@ import unidecode
 from pure_protobuf.dataclasses_ import field, message
 from pure_protobuf.types import int32
 
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
+from komikku.servers import xor_buffer
 
 LANGUAGES_CODES = dict(
     en=0,
@@ -50,7 +51,7 @@ class Mangaplus(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers = headers
 
     def get_manga_data(self, initial_data):
@@ -152,10 +153,9 @@ class Mangaplus(Server):
 
         if page['encryption_key'] is not None:
             # Decryption
-            key_stream = [int(v, 16) for v in RE_ENCRYPTION_KEY.findall(page['encryption_key'])]
-            block_size_in_bytes = len(key_stream)
+            key = [int(v, 16) for v in RE_ENCRYPTION_KEY.findall(page['encryption_key'])]
 
-            content = bytes([int(v) ^ key_stream[index % block_size_in_bytes] for index, v in enumerate(r.content)])
+            content = xor_buffer(r.content, key)
         else:
             content = r.content
 
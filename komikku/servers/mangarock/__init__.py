@@ -6,9 +6,9 @@
 
 from datetime import datetime
 import json
-import requests
 
 from komikku.servers import convert_mri_data_to_webp_buffer
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
@@ -43,7 +43,7 @@ class Mangarock(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers.update(headers)
 
     def get_manga_data(self, initial_data):
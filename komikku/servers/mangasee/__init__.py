@@ -4,12 +4,12 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: Valéry Febvre <vfebvre@easter-eggs.com>
 
-from bs4 import BeautifulSoup
 import cloudscraper
 import json
 
 from komikku.servers import convert_date_string
 from komikku.servers import get_buffer_mime_type
+from komikku.servers import parse_html
 from komikku.servers import Server
 from komikku.servers import USER_AGENT_MOBILE
 from komikku.utils import log_error_traceback
@@ -70,7 +70,7 @@ class Mangasee(Server):
             cover=self.cover_url.format(data['slug']),
         ))
 
-        soup = BeautifulSoup(r.content, 'lxml')
+        soup = parse_html(r.content)
 
         data['name'] = soup.find('h1').text.strip()
 
@@ -164,7 +164,7 @@ class Mangasee(Server):
         if mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.content, 'lxml')
+        soup = parse_html(r.content)
 
         chapter = None
         domain = None
@@ -252,7 +252,7 @@ class Mangasee(Server):
             if mime_type != 'text/html':
                 return None
 
-            soup = BeautifulSoup(r.content, 'lxml')
+            soup = parse_html(r.content)
 
             try:
                 for script in soup.find_all('script'):
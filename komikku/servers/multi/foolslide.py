@@ -8,9 +8,9 @@ import base64
 from bs4 import BeautifulSoup
 import json
 import re
-import requests
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
@@ -36,7 +36,7 @@ class FoOlSlide(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers.update({'user-agent': USER_AGENT})
 
     @staticmethod
@@ -18,11 +18,12 @@
 
 from bs4 import BeautifulSoup
 import datetime
-import requests
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import get_soup_element_inner_text
+from komikku.servers import parse_html
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
 
@@ -34,7 +35,7 @@ class Madara(Server):
         self.chapter_url = self.base_url + 'manga/{0}/{1}/?style=list'
 
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers.update({'user-agent': USER_AGENT})
 
     def get_manga_data(self, initial_data):
@@ -233,7 +234,7 @@ class Madara(Server):
         if r.status_code != 200:
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         results = []
         for element in soup.find_all('div', class_='post-title'):
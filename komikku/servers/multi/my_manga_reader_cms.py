@@ -13,10 +13,11 @@
 
 from bs4 import BeautifulSoup
 import re
-import requests
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
+from komikku.servers import parse_html
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
 
@@ -32,7 +33,7 @@ class MyMangaReaderCMS(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers.update({'user-agent': USER_AGENT})
 
     def get_manga_data(self, initial_data):
@@ -52,7 +53,7 @@ class MyMangaReaderCMS(Server):
         if r.status_code != 200 or mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         data = initial_data.copy()
         data.update(dict(
@@ -4,12 +4,12 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: Liliana Prikler <liliana.prikler@gmail.com>
 
-from bs4 import BeautifulSoup
 import json
-import requests
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
+from komikku.servers import parse_html
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
 
@@ -31,7 +31,7 @@ class Nhentai(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers.update({'user-agent': USER_AGENT})
 
     def get_manga_data(self, initial_data):
@@ -50,7 +50,7 @@ class Nhentai(Server):
         if mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         data = initial_data.copy()
         data.update(dict(
@@ -104,7 +104,7 @@ class Nhentai(Server):
         if mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         pages = []
         for script_element in soup.find_all('script'):
@@ -164,7 +164,7 @@ class Nhentai(Server):
         if r.status_code == 200:
             try:
                 results = []
-                soup = BeautifulSoup(r.text, 'lxml')
+                soup = parse_html(r.text)
                 elements = soup.find_all('div', class_='gallery')
 
                 for element in elements:
@@ -6,10 +6,10 @@
 
 from collections import OrderedDict
 from bs4 import BeautifulSoup
-import requests
 from urllib.parse import unquote_plus
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import Server
 from komikku.servers import USER_AGENT
@@ -38,7 +38,7 @@ class Ninemanga(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers = headers
 
     @classmethod
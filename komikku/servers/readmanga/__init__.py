@@ -4,12 +4,12 @@
 # SPDX-License-Identifier: GPL-3.0-only or GPL-3.0-or-later
 # Author: GrownNed <grownned@gmail.com>
 
-from bs4 import BeautifulSoup
 import json
-import requests
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
+from komikku.servers import parse_html
 from komikku.servers import Server
 
 
@@ -26,7 +26,7 @@ class Readmanga(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
 
     def get_manga_data(self, initial_data):
         """
@@ -44,7 +44,7 @@ class Readmanga(Server):
         if mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         data = initial_data.copy()
         data.update(dict(
@@ -123,7 +123,7 @@ class Readmanga(Server):
         if mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         data = dict(
             pages=[],
@@ -192,7 +192,7 @@ class Readmanga(Server):
         if mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         results = []
         for h3_element in soup.find('div', class_='tiles').find_all('h3'):
@@ -214,7 +214,7 @@ class Readmanga(Server):
         if mime_type != 'text/html':
             return None
 
-        soup = BeautifulSoup(r.text, 'lxml')
+        soup = parse_html(r.text)
 
         results = []
         for h3_element in soup.find_all('h3')[1:]:
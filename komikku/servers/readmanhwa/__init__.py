@@ -5,9 +5,9 @@
 # Author: JaskaranSM
 
 from gettext import gettext as _
-import requests
 
 from komikku.models import Settings
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import USER_AGENT
 from komikku.servers import Server
@@ -49,7 +49,7 @@ class Readmanhwa(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.headers.update({'user-agent': USER_AGENT})
 
         # Update NSFW filter default value according to current settings
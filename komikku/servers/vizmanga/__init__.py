@@ -1,9 +1,9 @@
 from PIL import Image
-from bs4 import BeautifulSoup
 import re
 
 from komikku.servers import convert_date_string
 from komikku.servers import do_login
+from komikku.servers import parse_html
 from komikku.servers import Server
 
 # Improved from https://github.com/manga-py/manga-py
@@ -48,7 +48,7 @@ class Vizmanga(Server):
 
         self.refresh_login()
         r = self.session_get(self.api_chapters_url.format(initial_data['slug']))
-        soup = BeautifulSoup(r.content, 'lxml')
+        soup = parse_html(r.content)
 
         authors = []
         synopsis = ''
@@ -173,7 +173,7 @@ class Vizmanga(Server):
         """
         r = self.session_get(self.api_series_url)
 
-        soup = BeautifulSoup(r.content, 'lxml')
+        soup = parse_html(r.content)
         divs = soup.findAll('a', {'class': 'disp-bl pad-b-rg pos-r bg-off-black color-white hover-bg-red'})
         result = []
         for div in divs:
@@ -195,7 +195,7 @@ class Vizmanga(Server):
 
     def refresh_login(self):
         r = self.session_get(self.refresh_login_url)
-        soup = BeautifulSoup(r.content, 'lxml')
+        soup = parse_html(r.content)
         return bool(soup.select('.o_profile-link'))
 
     def login(self, username, password):
@@ -9,6 +9,7 @@ import requests
 from urllib.parse import urlsplit
 
 from komikku.servers import convert_date_string
+from komikku.servers import create_session
 from komikku.servers import get_buffer_mime_type
 from komikku.servers import get_soup_element_inner_text
 from komikku.servers import Server
@@ -73,7 +74,7 @@ class Webtoon(Server):
 
     def __init__(self):
         if self.session is None:
-            self.session = requests.Session()
+            self.session = create_session()
             self.session.cookies.set_cookie(COOKIE_AGE_GATE_PASS)
             self.session.cookies.set_cookie(COOKIE_NEED_GDPR)
             self.session.cookies.set_cookie(COOKIE_DISALLOW_ANALYSIS)
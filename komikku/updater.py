@@ -22,6 +22,7 @@ class Updater(GObject.GObject):
     Mangas updater
     """
     __gsignals__ = {
+        'ended': (GObject.SIGNAL_RUN_FIRST, None, (int, int)),
         'manga-updated': (GObject.SIGNAL_RUN_FIRST, None, (GObject.TYPE_PYOBJECT, int, int, bool)),
     }
 
@@ -116,6 +117,7 @@ class Updater(GObject.GObject):
                 )
 
             GLib.timeout_add(2000, show_notification, summary, message, True)
+            GLib.idle_add(self.emit, 'ended', total_recent_chapters, total_errors)
 
         def complete(manga, recent_chapters_ids, nb_deleted_chapters, synced):
             nb_recent_chapters = len(recent_chapters_ids)
@@ -145,7 +147,7 @@ class Updater(GObject.GObject):
         if self.running or len(self.queue) == 0:
             return
 
-        if Settings.get_default().desktop_notifications:
+        if Settings.get_default().desktop_notifications and Notify.is_initted():
             notification = Notify.Notification.new('')
             notification.set_timeout(Notify.EXPIRES_DEFAULT)
 
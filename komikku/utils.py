@@ -18,7 +18,6 @@ import os
 from PIL import Image
 from PIL import ImageChops
 import requests
-import subprocess
 import traceback
 
 gi.require_version('Gdk', '3.0')
@@ -34,9 +33,25 @@ from gi.repository.GdkPixbuf import PixbufSimpleAnim
 
 keyring.core.init_backend()
 
+BORDERS_CROP_THRESHOLD = 225  # TODO: Add a slider in settings
+
 logger = logging.getLogger('komikku')
 
 
+def compute_borders_crop_bbox(path, threshold=BORDERS_CROP_THRESHOLD):
+    """Computes the bounding box of the content of an image, surrounded by white borders
+
+    :return: a (left, upper, right, lower) tuple or None if image is blank
+    """
+    def lookup(x):
+        return 255 if x > threshold else 0
+
+    im = Image.open(path).convert('L').point(lookup, mode='1')
+    bg = Image.new(im.mode, im.size, 255)
+
+    return ImageChops.difference(im, bg).getbbox()
+
+
 def create_cairo_surface_from_pixbuf(pixbuf, hidpi_scale):
     if pixbuf.get_n_channels() == 3:
         format = cairo.Format.RGB24
@@ -54,15 +69,6 @@ def create_cairo_surface_from_pixbuf(pixbuf, hidpi_scale):
     return surface
 
 
-def folder_size(path):
-    if not os.path.exists(path):
-        return 0
-
-    res = subprocess.run(['du', '-sh', path], stdout=subprocess.PIPE, check=False)
-
-    return res.stdout.split()[0].decode()
-
-
 @lru_cache(maxsize=None)
 def get_cache_dir():
     cache_dir_path = GLib.get_user_cache_dir()
@@ -106,6 +112,16 @@ def get_data_dir():
     return data_dir_path
 
 
+@lru_cache(maxsize=None)
+def get_pixbuf_mime_types():
+    """Returns MIME types of images which can be loaded by installed GdkPixbuf loaders"""
+    mime_types = set()
+    for pixbuf_format in Pixbuf.get_formats():
+        mime_types.update(pixbuf_format.get_mime_types())
+
+    return mime_types
+
+
 def html_escape(s):
     return html.escape(html.unescape(s), quote=False)
 
@@ -219,18 +235,6 @@ class Imagebuf:
 
         return cls(None, buffer, width, height)
 
-    def _compute_borders_crop_bbox(self):
-        # TODO: Add a slider in settings
-        threshold = 225
-
-        def lookup(x):
-            return 255 if x > threshold else 0
-
-        im = Image.open(self.path).convert('L').point(lookup, mode='1')
-        bg = Image.new(im.mode, im.size, 255)
-
-        return ImageChops.difference(im, bg).getbbox()
-
     def _get_pixbuf_from_bytes(self, width, height):
         loader = PixbufLoader.new()
         loader.set_size(width, height)
@@ -244,15 +248,20 @@ class Imagebuf:
 
         return animation
 
-    def crop_borders(self):
+    def crop_borders(self, bbox=None):
         """"Crop white borders
 
+        :param bbox: Optional precomputed bounding box (see compute_borders_crop_bbox)
         :return: New cropped Imagebuf or self if it can't be cropped
         """
         if self.animated or self.path is None:
             return self
 
-        bbox = self._compute_borders_crop_bbox()
+        if bbox is None:
+            bbox = compute_borders_crop_bbox(self.path)
+            if bbox is None:
+                # Blank image
+                return self
 
         # Crop is possible if computed bbox is included in pixbuf
         if bbox[2] - bbox[0] < self.width or bbox[3] - bbox[1] < self.height:
@@ -0,0 +1,65 @@
+import logging
+
+from komikku.reader.pager.images_cache import ImagesCache
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+def test_images_cache_lru_eviction():
+    cache = ImagesCache(size=100)
+
+    cache.set('a', 'A', 40)
+    cache.set('b', 'B', 40)
+    # Access 'a': 'b' becomes the least recently used entry
+    assert cache.get('a') == 'A'
+
+    cache.set('c', 'C', 40)
+    assert cache.get('b') is None
+    assert cache.get('a') == 'A'
+    assert cache.get('c') == 'C'
+    assert cache.used == 80
+
+    stats = cache.get_stats()
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 3
+    assert stats['misses'] == 1
+    assert stats['hit_rate'] == 0.75
+
+
+def test_images_cache_oversized_and_replaced_entries():
+    cache = ImagesCache(size=100)
+
+    # Entry bigger than budget is not cached
+    cache.set('big', 'BIG', 101)
+    assert cache.get('big') is None
+    assert cache.used == 0
+
+    cache.set('a', 'A', 30)
+    cache.set('a', 'A2', 50)
+    assert cache.get('a') == 'A2'
+    assert cache.used == 50
+
+
+def test_images_cache_stats_and_invalidation():
+    cache = ImagesCache(size=100)
+
+    cache.set(('prepared', '/page.jpg', 1), 'prepared', 10)
+    cache.set(('imagebuf', '/page.jpg', 1), 'imagebuf', 10)
+    cache.set(('imagebuf', '/other.jpg', 1), 'other', 10)
+
+    # Fallback lookups are not accounted in stats
+    assert cache.get(('imagebuf', '/missing.jpg', 1), stats=False) is None
+    assert cache.get(('imagebuf', '/page.jpg', 1), stats=False) == 'imagebuf'
+    assert cache.get_stats()['hits'] == 0
+    assert cache.get_stats()['misses'] == 0
+
+    cache.invalidate('/page.jpg')
+    assert cache.get(('prepared', '/page.jpg', 1)) is None
+    assert cache.get(('imagebuf', '/page.jpg', 1)) is None
+    assert cache.get(('imagebuf', '/other.jpg', 1)) == 'other'
+    assert cache.used == 10
+
+    cache.clear()
+    assert cache.get_stats()['entries'] == 0
+    assert cache.used == 0
@@ -0,0 +1,181 @@
+import datetime
+import logging
+from PIL import Image
+import pytest
+
+import komikku.servers
+from komikku.servers import convert_date_string
+from komikku.servers import get_unscramble_bands_moves
+from komikku.servers import parse_absolute_date_string
+from komikku.servers import parse_relative_date_string
+from komikku.servers import ResponseCache
+from komikku.servers import unscramble_image
+from komikku.servers import xor_buffer
+
+logging.basicConfig(level=logging.DEBUG)
+
+
+class FakeServer:
+    id = 'fake'
+
+    def __init__(self):
+        self.calls = 0
+
+    def search(self, term):
+        self.calls += 1
+
+        return [dict(slug=term, name=term.title())] if term else []
+
+
+@pytest.fixture
+def response_cache(monkeypatch, tmp_path):
+    monkeypatch.setattr(ResponseCache, 'dir', property(lambda self: str(tmp_path)))
+
+    return ResponseCache('test', maxsize=2)
+
+
+def test_convert_date_string():
+    assert convert_date_string('2021-12-25') == datetime.date(2021, 12, 25)
+    assert convert_date_string('December 25, 2021') == datetime.date(2021, 12, 25)
+    assert convert_date_string('25/12/2021', format='%d/%m/%Y') == datetime.date(2021, 12, 25)
+
+    # Format given by a server must not change the way dates without format are parsed
+    assert convert_date_string('03/05/2021', format='%d/%m/%Y') == datetime.date(2021, 5, 3)
+    assert convert_date_string('25/12/2021') == datetime.date(2021, 12, 25)
+
+
+def test_parse_absolute_date_string():
+    assert parse_absolute_date_string('2021-12-25 10:20:30', '%Y-%m-%d %H:%M:%S') == datetime.datetime(2021, 12, 25, 10, 20, 30)
+    assert parse_absolute_date_string('December 25, 2021') == datetime.datetime(2021, 12, 25)
+    # Ambiguous numeric dates are not parsed (nor memoized) without format
+    assert parse_absolute_date_string('03/05/2021') is None
+    assert parse_absolute_date_string('03/05/2021', '%d/%m/%Y') == datetime.datetime(2021, 5, 3)
+    assert parse_absolute_date_string('2 days ago') is None
+    assert parse_absolute_date_string(None) is None
+
+
+def test_parse_relative_date_string():
+    today = datetime.date.today()
+
+    assert parse_relative_date_string('today') == today
+    assert parse_relative_date_string('Just now') == today
+    assert parse_relative_date_string('yesterday') == today - datetime.timedelta(days=1)
+    assert parse_relative_date_string('2 days ago') == today - datetime.timedelta(days=2)
+    assert parse_relative_date_string('a week ago') == today - datetime.timedelta(weeks=1)
+    assert parse_relative_date_string('1 year ago').year == today.year - 1
+
+    month_ago = parse_relative_date_string('a month ago')
+    assert (month_ago.year * 12 + month_ago.month) == (today.year * 12 + today.month - 1)
+    assert month_ago.day <= today.day
+
+    assert parse_relative_date_string('2021-12-25') is None
+    assert parse_relative_date_string(None) is None
+
+
+def test_response_cache(response_cache):
+    server = FakeServer()
+
+    response = response_cache.call(60, server, 'search', 'berserk')
+    assert response == [dict(slug='berserk', name='Berserk')]
+    assert response_cache.call(60, server, 'search', 'berserk') == response
+    assert server.calls == 1
+
+    # Cached responses are copies
+    response[0]['name'] = 'Modified'
+    assert response_cache.call(60, server, 'search', 'berserk')[0]['name'] == 'Berserk'
+
+    # Empty responses are not cached
+    response_cache.call(60, server, 'search', '')
+    response_cache.call(60, server, 'search', '')
+    assert server.calls == 3
+
+    # Expired responses are not returned
+    response_cache.call(0, server, 'search', 'vagabond')
+    response_cache.call(0, server, 'search', 'vagabond')
+    assert server.calls == 5
+
+
+def test_response_cache_eviction_and_persistence(response_cache, tmp_path):
+    server = FakeServer()
+
+    for term in ('a', 'b', 'c'):
+        response_cache.call(60, server, 'search', term)
+    assert server.calls == 3
+
+    # Least recently used entry has been evicted (in memory), number of files on disk is bounded too
+    assert list(response_cache.entries) == [ResponseCache.get_key(server, 'search', term) for term in ('b', 'c')]
+    assert len(list(tmp_path.iterdir())) == 2
+
+    # Responses are persisted on disk
+    response_cache.clear()
+    response_cache.call(60, server, 'search', 'd')
+    response_cache.entries.clear()
+    assert response_cache.call(60, server, 'search', 'd') == [dict(slug='d', name='D')]
+    assert server.calls == 4
+
+    response_cache.clear()
+    assert not list(tmp_path.iterdir())
+    response_cache.call(60, server, 'search', 'd')
+    assert server.calls == 5
+
+
+def test_get_unscramble_bands_moves():
+    assert get_unscramble_bands_moves(450, 'swap', 100) == [
+        (0, 100, 100),
+        (100, 100, 0),
+        (200, 100, 300),
+        (300, 100, 200),
+        (400, 50, 400),
+    ]
+
+    # Moves are a permutation: every destination pixel is written once from a distinct source pixel
+    for length in (1, 99, 200, 399, 1234):
+        moves = get_unscramble_bands_moves(length, 'swap', 100)
+        assert sorted(i for src, size, _dst in moves for i in range(src, src + size)) == list(range(length))
+        assert sorted(i for _src, size, dst in moves for i in range(dst, dst + size)) == list(range(length))
+
+    with pytest.raises(ValueError):
+        get_unscramble_bands_moves(100, 'unknown', 10)
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_unscramble_image(monkeypatch, use_numpy):
+    if not use_numpy:
+        # Bands are moved with PIL
+        monkeypatch.setattr(komikku.servers, 'numpy', None)
+    elif komikku.servers.numpy is None:
+        pytest.skip('NumPy is not installed')
+
+    width, height = 450, 230
+    image = Image.new('RGB', (width, height))
+    image.putdata([(x % 256, y % 256, (x // 256) * 16 + y // 256) for y in range(height) for x in range(width)])
+
+    def source(position, length):
+        for src, size, dst in get_unscramble_bands_moves(length, 'swap', 100):
+            if dst <= position < dst + size:
+                return src + position - dst
+
+    unscrambled_image = unscramble_image(image)
+    for x, y in ((0, 0), (99, 10), (100, 100), (250, 150), (449, 229), (420, 205)):
+        assert unscrambled_image.getpixel((x, y)) == image.getpixel((source(x, width), source(y, height)))
+
+    # Swap scheme is its own inverse
+    assert unscramble_image(unscrambled_image).tobytes() == image.tobytes()
+
+
+def test_xor_buffer():
+    buffer = bytes(range(256)) * 3 + b'komikku'
+
+    def xor_buffer_per_byte(buffer, key):
+        return bytes(byte ^ key[index % len(key)] for index, byte in enumerate(buffer))
+
+    # Single byte key
+    assert xor_buffer(buffer, 0x5a) == xor_buffer_per_byte(buffer, b'\x5a')
+    # Multi-bytes keys (bytes, list of ints), leading zero bytes must be preserved
+    assert xor_buffer(buffer, b'\x00\x01\xfe') == xor_buffer_per_byte(buffer, b'\x00\x01\xfe')
+    assert xor_buffer(b'\x00\x00' + buffer, [0x12, 0x34, 0x56, 0x78]) == xor_buffer_per_byte(b'\x00\x00' + buffer, b'\x12\x34\x56\x78')
+    # XOR is its own inverse
+    assert xor_buffer(xor_buffer(buffer, b'key'), b'key') == buffer
+
+    assert xor_buffer(b'', b'key') == b''
+    assert xor_buffer(bytearray(b'abc'), b'') == b'abc'